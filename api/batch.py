@@ -0,0 +1,118 @@
+import json
+import logging
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from api.loaders import ObjectLoader, get_loader
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+BATCH_PREFIX = "/api/"
+
+
+def sub_request(request, method, url, body=None, headers=None):
+    """
+    Build Django HttpRequest for one item of batch.
+
+    Sub-request shares user, session, cookies and identity map
+        of parent request, CSRF is checked once for parent POST.
+    """
+
+    parts = urlsplit(url)
+    http_request = request._request
+
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = parts.path
+    sub.GET = QueryDict(parts.query)
+    sub.COOKIES = http_request.COOKIES
+    sub.META = {
+        key: value
+        for key, value in http_request.META.items()
+        if not key.startswith("HTTP_") or key in ("HTTP_HOST", "HTTP_COOKIE")
+    }
+    sub.META.update(
+        {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": parts.path,
+            "QUERY_STRING": parts.query,
+        }
+    )
+    for name, value in (headers or {}).items():
+        sub.META["HTTP_" + name.upper().replace("-", "_")] = str(value)
+
+    raw = b"" if body is None else json.dumps(body).encode("utf-8")
+    sub.META["CONTENT_TYPE"] = "application/json"
+    sub.META["CONTENT_LENGTH"] = str(len(raw))
+    sub._stream = BytesIO(raw)
+    sub._read_started = False
+
+    sub.user = http_request.user
+    sub.session = http_request.session
+    sub.object_loader = get_loader(request)
+    sub._dont_enforce_csrf_checks = True
+    return sub
+
+
+def dispatch(request, item, forbidden_views=()):
+    """
+    Resolve and call view for batch item,
+        return {"status", "headers", "body"} dict.
+    """
+
+    if not isinstance(item, dict):
+        return {"status": 400, "headers": {}, "body": None}
+    method = str(item.get("method", "GET")).upper()
+    url = item.get("url")
+    if (
+        method not in BATCH_METHODS
+        or not isinstance(url, str)
+        or not url.startswith(BATCH_PREFIX)
+        or not isinstance(item.get("headers", {}), dict)
+    ):
+        return {"status": 400, "headers": {}, "body": None}
+
+    sub = sub_request(
+        request, method, url, item.get("body"), item.get("headers")
+    )
+    try:
+        match = resolve(sub.path_info)
+    except Resolver404:
+        return {"status": 404, "headers": {}, "body": None}
+    if getattr(match.func, "cls", None) in forbidden_views:
+        return {"status": 400, "headers": {}, "body": None}
+
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+        if response.streaming:
+            response.close()
+            return {"status": 400, "headers": {}, "body": None}
+        if hasattr(response, "render"):
+            response.render()
+    except Exception:
+        logger.exception("Batch sub-request failed: %s %s", method, url)
+        return {"status": 500, "headers": {}, "body": None}
+    finally:
+        # writes might change or delete loaded objects
+        if method != "GET":
+            request._request.object_loader = ObjectLoader()
+
+    content = response.content.decode(response.charset or "utf-8")
+    if content and response.get("Content-Type", "").startswith(
+        "application/json"
+    ):
+        content = json.loads(content)
+    return {
+        "status": response.status_code,
+        "headers": {
+            name: response[name]
+            for name in ("ETag", "Content-Type")
+            if response.has_header(name)
+        },
+        "body": content or None,
+    }
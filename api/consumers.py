@@ -0,0 +1,92 @@
+import json
+
+from channels.generic.http import AsyncHttpConsumer
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.http import QueryDict
+
+from main.push import user_group
+from api.exceptions import BadRequestException, ForbiddenException
+from api.exports import async_chunks, export_lines
+
+
+class BalanceConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Push channel of balances changes for web client,
+        messages are sent by main.push after every committed
+        transaction change, made by site or bot:
+        {"assets": [{"pk", "balance"}], "incomes": [...], "expenses": [...]}
+    """
+
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = user_group(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(
+                self.group_name, self.channel_name
+            )
+
+    async def balances_changed(self, event):
+        await self.send_json(event["payload"])
+
+
+class ExportConsumer(AsyncHttpConsumer):
+    """
+    ASGI version of api.views.ExportSet for daphne.
+
+    Django 3.0 iterates StreamingHttpResponse synchronously
+        inside event loop, so slow rows reads would block all
+        connections of process. Here lines are produced by thread
+        and every chunk is awaited and sent with more_body.
+    """
+
+    chunk_size = 2000
+
+    async def send_error(self, exception):
+        await self.send_response(
+            exception.status_code,
+            json.dumps(exception.default_detail).encode("utf-8"),
+            headers=[(b"Content-Type", b"application/json")],
+        )
+
+    async def handle(self, body):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.send_error(ForbiddenException)
+            return
+        if self.scope["method"] not in ("GET", "HEAD"):
+            await self.send_error(BadRequestException)
+            return
+
+        params = QueryDict(self.scope["query_string"])
+        try:
+            content_type, output, lines = export_lines(
+                user, params, self.chunk_size
+            )
+        except ValueError:
+            await self.send_error(BadRequestException)
+            return
+
+        await self.send_headers(
+            headers=[
+                (b"Content-Type", content_type.encode("utf-8")),
+                (
+                    b"Content-Disposition",
+                    f'attachment; filename="transactions.{output}"'.encode(
+                        "utf-8"
+                    ),
+                ),
+            ]
+        )
+        async for chunk in async_chunks(lines):
+            await self.send_body(chunk.encode("utf-8"), more_body=True)
+        await self.send_body(b"")
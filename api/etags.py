@@ -0,0 +1,64 @@
+from hashlib import md5
+
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from main.models import DataVersion
+from api.exceptions import NotModifiedException
+
+
+class ETagMixin(object):
+    """
+    Conditional GET support for read endpoints.
+
+    ETag is built from per user DataVersion (bumped on any write
+        of user's data) and request path, "If-None-Match" is checked
+        after authentication and permissions, but before view action,
+        so there are no serializers and aggregate queries for 304.
+    Current month is a part of ETag too: summary of the latest month
+        changes with calendar month without any write.
+    """
+
+    etag_actions = ("list", "retrieve")
+
+    def get_etag(self, request):
+        version = DataVersion.current(request.user.pk)
+        now = timezone.localtime()
+        path = md5(request.get_full_path().encode("utf-8")).hexdigest()
+        return "W/" + quote_etag(
+            f"{request.user.pk}-{version}-{now.year}-{now.month:02}"
+            + f"-{path[:12]}"
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        self.etag = None
+        if request.method not in ("GET", "HEAD"):
+            return
+        if self.action not in self.etag_actions:
+            return
+
+        self.etag = self.get_etag(request)
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match and self.etag in parse_etags(if_none_match):
+            raise NotModifiedException()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModifiedException):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": self.etag},
+            )
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        etag = getattr(self, "etag", None)
+        if etag and response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
@@ -24,3 +24,14 @@ class NotFoundException(APIException):
     status_code = status.HTTP_404_NOT_FOUND
     default_detail = {"error": True, "message": "Object not found"}
     default_code = "not_found"
+
+
+class NotModifiedException(APIException):
+    """
+    Raised by ETagMixin before view action runs,
+        converted into empty 304 response.
+    """
+
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = ""
+    default_code = "not_modified"
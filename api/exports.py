@@ -0,0 +1,194 @@
+import asyncio
+import concurrent.futures
+import csv
+import json
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from main.models import IncomeTransaction, ExpenseTransaction
+from main.utils import period_bounds, period_filter
+
+
+EXPORT_FIELDS = (
+    "type",
+    "id",
+    "created_at",
+    "amount",
+    "asset_id",
+    "asset",
+    "category_id",
+    "category",
+    "tags",
+)
+
+EXPORT_SOURCES = {
+    "income": IncomeTransaction,
+    "expense": ExpenseTransaction,
+}
+
+
+def transaction_rows(user, kinds, period, chunk_size):
+    """
+    Generator of flat transaction dicts, rows are read
+        with values() and iterator(), so memory doesn't depend
+        on history length.
+    """
+
+    for kind in kinds:
+        model = EXPORT_SOURCES[kind]
+        category = model.CATEGORY_FIELD
+        fields = [
+            "id",
+            "created_at",
+            "amount",
+            "asset_id",
+            "asset__description",
+            f"{category}_id",
+            f"{category}__description",
+        ]
+        if kind == "expense":
+            fields.append("tags")
+
+        queryset = (
+            model.objects.filter(
+                asset__user=user, **{f"{category}__user": user}, **period
+            )
+            .order_by("created_at", "id")
+            .values(*fields)
+        )
+        for row in queryset.iterator(chunk_size=chunk_size):
+            yield {
+                "type": kind,
+                "id": row["id"],
+                "created_at": row["created_at"],
+                "amount": row["amount"],
+                "asset_id": row["asset_id"],
+                "asset": row["asset__description"],
+                "category_id": row[f"{category}_id"],
+                "category": row[f"{category}__description"],
+                "tags": row.get("tags") or "",
+            }
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Echo:
+    """
+    Pseudo buffer for csv.writer, returns written line.
+    https://docs.djangoproject.com/en/3.0/howto/outputting-csv/#streaming-large-csv-files
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(
+            [
+                row["created_at"].isoformat()
+                if field == "created_at"
+                else row[field]
+                for field in EXPORT_FIELDS
+            ]
+        )
+
+
+EXPORT_OUTPUTS = {
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+    "csv": ("text/csv", csv_lines),
+}
+
+
+def export_lines(user, params, chunk_size):
+    """
+    Validate export query params and return
+        (content type, output name, lines generator):
+    - "output": "ndjson" (default) or "csv";
+    - "type": "income" or "expense", by default both;
+    - "from" and "to" period bounds.
+    Raise ValueError on wrong params.
+    """
+
+    output = params.get("output", "ndjson")
+    kind = params.get("type")
+    if output not in EXPORT_OUTPUTS:
+        raise ValueError(f"unknown output: {output}")
+    if kind is not None and kind not in EXPORT_SOURCES:
+        raise ValueError(f"unknown type: {kind}")
+
+    content_type, render_lines = EXPORT_OUTPUTS[output]
+    rows = transaction_rows(
+        user,
+        (kind,) if kind else tuple(EXPORT_SOURCES),
+        period_filter(*period_bounds(params.get("from"), params.get("to"))),
+        chunk_size,
+    )
+    return content_type, output, render_lines(rows)
+
+
+async def async_chunks(lines, max_chunks=16, batch=500):
+    """
+    Async iterator of joined lines, generator is consumed
+        in separate thread with own DB connection.
+
+    Chunks are passed through bounded asyncio queue, so event loop
+        only awaits them and serves other connections meanwhile,
+        producer waits while queue is full.
+    """
+
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(maxsize=max_chunks)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        try:
+            future = asyncio.run_coroutine_threadsafe(chunks.put(item), loop)
+        except RuntimeError:
+            # event loop has been closed
+            return False
+        while not stopped.is_set():
+            try:
+                future.result(timeout=1)
+                return True
+            except concurrent.futures.TimeoutError:
+                pass
+        future.cancel()
+        return False
+
+    def produce():
+        try:
+            chunk = []
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) >= batch:
+                    if not put("".join(chunk)):
+                        return
+                    chunk = []
+            if chunk:
+                put("".join(chunk))
+        except Exception as err:
+            put(err)
+        finally:
+            put(done)
+            connection.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = await chunks.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
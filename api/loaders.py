@@ -0,0 +1,67 @@
+from django.core.exceptions import ValidationError
+
+
+class ObjectLoader:
+    """
+    Request scoped identity map.
+
+    Every (model, pk) pair is fetched at most once per request,
+        objects of one model are loaded with single pk__in query.
+    Permissions, viewsets and serializers share one loader
+        through get_loader(request).
+    """
+
+    def __init__(self):
+        self._objects = {}
+
+    @staticmethod
+    def _to_pk(model, pk):
+        try:
+            return model._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+
+    def prime(self, *objects):
+        """
+        Store already fetched objects.
+        """
+        for obj in objects:
+            self._objects[(type(obj), obj.pk)] = obj
+
+    def load_many(self, model, pks, queryset=None):
+        """
+        Return {pk: object or None} for input primary keys,
+            only missing keys are fetched from database.
+        """
+
+        pks = {pk: self._to_pk(model, pk) for pk in pks}
+        missing = {
+            pk
+            for pk in pks.values()
+            if pk is not None and (model, pk) not in self._objects
+        }
+        if missing:
+            if queryset is None:
+                queryset = model.objects.all()
+            found = queryset.in_bulk(missing)
+            for pk in missing:
+                self._objects[(model, pk)] = found.get(pk)
+
+        return {
+            key: self._objects.get((model, pk)) for key, pk in pks.items()
+        }
+
+    def load(self, model, pk, queryset=None):
+        return self.load_many(model, [pk], queryset=queryset)[pk]
+
+
+def get_loader(request):
+    """
+    Return loader bound to Django HttpRequest,
+        so DRF Request wrappers of one request share it.
+    """
+
+    http_request = getattr(request, "_request", request)
+    if not hasattr(http_request, "object_loader"):
+        http_request.object_loader = ObjectLoader()
+    return http_request.object_loader
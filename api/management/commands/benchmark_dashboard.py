@@ -0,0 +1,148 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from main.models import (
+    Asset,
+    IncomeSource,
+    ExpenseCategory,
+    IncomeTransaction,
+    ExpenseTransaction,
+)
+from api.views import InformationSet, ConcurrentInformationSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sequential and concurrent summary builders "
+        + "of /api/common-info/, temporary data is removed at the end"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assets", type=int, default=50)
+        parser.add_argument("--categories", type=int, default=300)
+        parser.add_argument("--transactions", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="simulated per query round trip of networked DB, in ms",
+        )
+
+    def _seed(self, user, options):
+        """
+        Data is committed, because concurrent reads
+            use separate connections.
+        """
+
+        Asset.objects.bulk_create(
+            Asset(user=user, description=f"asset {i}")
+            for i in range(options["assets"])
+        )
+        assets = list(Asset.objects.filter(user=user))
+        IncomeSource.objects.bulk_create(
+            IncomeSource(user=user, description=f"income {i}")
+            for i in range(options["categories"])
+        )
+        incomes = list(IncomeSource.objects.filter(user=user))
+        ExpenseCategory.objects.bulk_create(
+            ExpenseCategory(
+                user=user, description=f"expense {i}", monthly_limit=1000
+            )
+            for i in range(options["categories"])
+        )
+        expenses = list(ExpenseCategory.objects.filter(user=user))
+
+        IncomeTransaction.bulk_save(
+            [
+                IncomeTransaction(
+                    asset=assets[i % len(assets)],
+                    income=incomes[i % len(incomes)],
+                    amount=i % 100 + 1,
+                )
+                for i in range(options["transactions"])
+            ]
+        )
+        ExpenseTransaction.bulk_save(
+            [
+                ExpenseTransaction(
+                    asset=assets[i % len(assets)],
+                    expense=expenses[i % len(expenses)],
+                    amount=i % 50 + 1,
+                )
+                for i in range(options["transactions"])
+            ]
+        )
+
+    @staticmethod
+    def _cleanup(user):
+        # transactions and rollups are removed by cascade
+        for model in (Asset, IncomeSource, ExpenseCategory):
+            model.objects.filter(user=user).delete()
+
+    def _add_latency(self, latency):
+        """
+        Sleep before every query of every connection,
+            local SQLite has almost no round trip cost.
+        """
+
+        def wrapper(execute, sql, params, many, context):
+            time.sleep(latency / 1000)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            # wrappers list survives reconnects of thread connection
+            if wrapper not in connection.execute_wrappers:
+                connection.execute_wrappers.append(wrapper)
+
+        self._latency = (wrapper, install)
+        connection_created.connect(install)
+        install(None, connection)
+
+    def _remove_latency(self):
+        wrapper, install = self._latency
+        connection_created.disconnect(install)
+        connection.execute_wrappers.remove(wrapper)
+
+    @staticmethod
+    def _measure(viewset, user, repeat):
+        view = viewset()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            payload = view.summary(user)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return payload, timings[0], timings[len(timings) // 2]
+
+    def handle(self, *args, **options):
+        user, _ = get_user_model().objects.get_or_create(username="benchmark")
+        self._cleanup(user)
+        self._seed(user, options)
+        if options["latency"]:
+            self._add_latency(options["latency"])
+        try:
+            results = {
+                name: self._measure(viewset, user, options["repeat"])
+                for name, viewset in (
+                    ("sequential", InformationSet),
+                    ("concurrent", ConcurrentInformationSet),
+                )
+            }
+            for name, (_, fastest, median) in results.items():
+                self.stdout.write(
+                    f"{name}: min {fastest * 1000:8.2f}ms, "
+                    + f"median {median * 1000:8.2f}ms"
+                )
+            self.stdout.write(
+                "same output: "
+                + str(results["sequential"][0] == results["concurrent"][0])
+            )
+        finally:
+            if options["latency"]:
+                self._remove_latency()
+            self._cleanup(user)
@@ -0,0 +1,100 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from main.models import Asset, IncomeSource, ExpenseCategory
+from api.views import AssetSet, IncomeSet, ExpenseSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure list endpoints of assets, incomes and expenses "
+        + "while other users' rows grow, temporary data is rolled back"
+    )
+
+    endpoints = (
+        ("assets", AssetSet, Asset, {}),
+        ("incomes", IncomeSet, IncomeSource, {}),
+        ("expenses", ExpenseSet, ExpenseCategory, {"monthly_limit": 100}),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, nargs="+", default=[10, 100, 1000]
+        )
+        parser.add_argument(
+            "--objects",
+            type=int,
+            default=30,
+            help="objects of every type per user",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def _seed(self, start, stop, objects):
+        """
+        Create users with numbers [start, stop) and their objects.
+        """
+
+        usernames = [f"benchmark-list-{i}" for i in range(start, stop)]
+        get_user_model().objects.bulk_create(
+            (get_user_model()(username=username) for username in usernames),
+            batch_size=400,
+        )
+        # SQLite backend doesn't return primary keys from bulk_create
+        users = list(
+            get_user_model().objects.filter(username__in=usernames)
+        )
+
+        for _, _, model, extra in self.endpoints:
+            model.objects.bulk_create(
+                (
+                    model(user=user, description=f"object {i}", **extra)
+                    for user in users
+                    for i in range(objects)
+                ),
+                batch_size=400,
+            )
+        return users
+
+    def _measure(self, view, user, repeat):
+        factory = APIRequestFactory()
+        timings = []
+        for _ in range(repeat):
+            request = factory.get("/")
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append(time.perf_counter() - started)
+        return response, min(timings), len(queries)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seeded = []
+            for total in sorted(options["users"]):
+                seeded += self._seed(
+                    len(seeded), total, options["objects"]
+                )
+                user = seeded[0]
+
+                for name, viewset, model, _ in self.endpoints:
+                    response, elapsed, queries = self._measure(
+                        viewset.as_view({"get": "list"}),
+                        user,
+                        options["repeat"],
+                    )
+                    self.stdout.write(
+                        f"users: {total:>6}, "
+                        + f"table rows: {model.objects.count():>8}, "
+                        + f"/api/{name}/: {elapsed * 1000:8.2f}ms "
+                        + f"({queries} queries, "
+                        + f"status {response.status_code}, "
+                        + f"count {response.data.get('count')})"
+                    )
+
+            transaction.set_rollback(True)
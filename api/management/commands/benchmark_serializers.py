@@ -0,0 +1,100 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.utils.encoders import JSONEncoder
+
+from main.models import Asset, ExpenseCategory, ExpenseTransaction
+from api.serializers import (
+    ExpenseTransactionSerializer,
+    FlatTransactionSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare nested ModelSerializer and flat values() serializer "
+        + "for transaction lists, temporary data is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transactions", type=int, default=5000)
+        parser.add_argument("--assets", type=int, default=3)
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[20, 100, 1000]
+        )
+
+    def _seed(self, options):
+        user, _ = get_user_model().objects.get_or_create(username="benchmark")
+        assets = [
+            Asset.objects.create(user=user, description=f"asset {i}")
+            for i in range(options["assets"])
+        ]
+        categories = [
+            ExpenseCategory.objects.create(
+                user=user, description=f"expense {i}", monthly_limit=1000
+            )
+            for i in range(options["categories"])
+        ]
+        ExpenseTransaction.bulk_save(
+            [
+                ExpenseTransaction(
+                    asset=assets[i % len(assets)],
+                    expense=categories[i % len(categories)],
+                    amount=i % 100 + 1,
+                    tags="food,lunch",
+                )
+                for i in range(options["transactions"])
+            ]
+        )
+        return user
+
+    @staticmethod
+    def _measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                data = func()
+                timings.append(time.perf_counter() - started)
+        return data, min(timings), len(queries)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self._seed(options)
+            queryset = ExpenseTransaction.objects.filter(asset__user=user)
+            flat = FlatTransactionSerializer(ExpenseTransactionSerializer)
+
+            for size in options["sizes"]:
+                nested_data, nested_time, nested_queries = self._measure(
+                    lambda: ExpenseTransactionSerializer(
+                        queryset.select_related()[:size], many=True
+                    ).data,
+                    options["repeat"],
+                )
+                flat_data, flat_time, flat_queries = self._measure(
+                    lambda: flat.data(
+                        queryset.values(*flat.values_fields())[:size]
+                    ),
+                    options["repeat"],
+                )
+
+                equal = json.dumps(
+                    nested_data, cls=JSONEncoder
+                ) == json.dumps(flat_data, cls=JSONEncoder)
+                self.stdout.write(
+                    f"rows: {size:>6}, "
+                    + f"nested: {nested_time * 1000:8.2f}ms "
+                    + f"({nested_queries} queries), "
+                    + f"flat: {flat_time * 1000:8.2f}ms "
+                    + f"({flat_queries} queries), "
+                    + f"speedup: {nested_time / flat_time:.1f}x, "
+                    + f"same output: {equal}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,294 @@
+import json
+import re
+import statistics
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from api.urls import router
+from api.views import BatchSet, InformationSet
+from bot.handlers.categories import IncomeHandler, AssetHandler, ExpenseHandler
+from bot.handlers.transactions import IncomingHandler, OutgoingHandler
+from bot.models import TelegramUser
+from main.cache import invalidate_dashboard
+
+
+BOT_HANDLERS = (
+    (IncomeHandler, ("show", "delete_menu")),
+    (AssetHandler, ("show", "delete_menu")),
+    (ExpenseHandler, ("show", "delete_menu")),
+    (IncomingHandler, ("show", "delete_menu", "create")),
+    (OutgoingHandler, ("show", "delete_menu", "create")),
+)
+
+
+class StubBot:
+    """
+    Telegram bot replacement, which only counts sent messages.
+    """
+
+    def __init__(self):
+        self.messages = 0
+
+    def send_message(self, **kwargs):
+        self.messages += 1
+
+
+class StubDispatcher:
+    """
+    Minimal dispatcher for CallbackContext.from_update().
+    """
+
+    use_context = True
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.bot_data = {}
+        self.user_data = defaultdict(dict)
+        self.chat_data = defaultdict(dict)
+
+
+def timing_stats(timings):
+    """
+    Milliseconds min, median and p95 of seconds list.
+    """
+
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every GET route of api.urls and bot handlers "
+        + "query paths for one user, print results as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username",
+            default="seed-0",
+            help="measured user, see seed_data command",
+        )
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--search", default="gro", help="search query")
+        parser.add_argument("--output", help="JSON file, stdout by default")
+
+    @staticmethod
+    def _sample_pk(viewset, user):
+        model = viewset.queryset.model
+        owner = (
+            "user"
+            if any(field.name == "user" for field in model._meta.fields)
+            else "asset__user"
+        )
+        return (
+            model.objects.filter(**{owner: user})
+            .order_by("-pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+
+    def _routes(self, user, options):
+        """
+        (route template, URL, GET params, cached) of every GET route,
+            detail routes get pk of user's latest object,
+            cached routes keep payload in dashboard cache.
+        """
+
+        routes = []
+        for pattern in router.urls:
+            if "get" not in pattern.callback.actions:
+                continue
+            template = "/api/" + str(pattern.pattern).strip("^$")
+            url = template
+            if "(?P<pk>" in template:
+                template = re.sub(r"\(\?P<pk>[^)]+\)", "{pk}", template)
+                pk = self._sample_pk(pattern.callback.cls, user)
+                if pk is None:
+                    continue
+                url = template.format(pk=pk)
+            params = {"q": options["search"]} if url == "/api/search/" else {}
+            cached = issubclass(pattern.callback.cls, InformationSet)
+            routes.append((template, url, params, cached))
+        return routes
+
+    @staticmethod
+    def _measure(call, repeat, prepare=None):
+        """
+        Call function repeat times, return
+            timings, queries of the last call and its result.
+            prepare is called before every call and isn't timed.
+        """
+
+        timings = []
+        for _ in range(repeat):
+            if prepare is not None:
+                prepare()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                result = call()
+                timings.append(time.perf_counter() - started)
+        return timings, len(queries), result
+
+    def _benchmark_api(self, user, options):
+        client = Client()
+        client.force_login(user)
+
+        def get(url, params):
+            response = client.get(url, params)
+            if response.streaming:
+                content = b"".join(response.streaming_content)
+            else:
+                content = response.content
+            return response.status_code, len(content)
+
+        results = []
+        routes = self._routes(user, options)
+        for template, url, params, cached in routes:
+            runs = [(None, None)]
+            if cached:
+                # query path with cache cleared before every call,
+                # then cache hits
+                runs = [
+                    ("cold", lambda: invalidate_dashboard(user.pk)),
+                    ("warm", None),
+                ]
+            for run, prepare in runs:
+                timings, queries, (status, size) = self._measure(
+                    lambda: get(url, params), options["repeat"], prepare
+                )
+                result = {
+                    "route": template,
+                    "method": "GET",
+                    "url": url,
+                    "status": status,
+                    "bytes": size,
+                    "queries": queries,
+                    **timing_stats(timings),
+                }
+                if cached:
+                    result["cache"] = run
+                results.append(result)
+
+        # batch route is POST only, it's measured with read sub-requests
+        batch = [
+            {"method": "GET", "url": url}
+            for template, url, params, cached in routes
+            if not params and url != "/api/export/"
+        ][: BatchSet.batch_max_size]
+        timings, queries, response = self._measure(
+            lambda: client.post(
+                "/api/batch/", batch, "application/json"
+            ),
+            options["repeat"],
+        )
+        results.append(
+            {
+                "route": "/api/batch/",
+                "method": "POST",
+                "url": "/api/batch/",
+                "status": response.status_code,
+                "bytes": len(response.content),
+                "queries": queries,
+                "sub_requests": len(batch),
+                **timing_stats(timings),
+            }
+        )
+        return results
+
+    def _benchmark_bot(self, user, options):
+        """
+        Call bot handlers with stub bot and dispatcher,
+            TelegramMessages written by handlers are rolled back.
+        """
+
+        results = []
+        with transaction.atomic():
+            telegram_user = TelegramUser.objects.filter(user=user).first()
+            if telegram_user is None:
+                telegram_user = TelegramUser.objects.create(
+                    tg_username=f"benchmark_{user.pk}", user=user
+                )
+
+            bot = StubBot()
+            dispatcher = StubDispatcher(bot)
+            for handler, methods in BOT_HANDLERS:
+                for method in methods:
+                    update = Update.de_json(
+                        {
+                            "update_id": 1,
+                            "callback_query": {
+                                "id": "1",
+                                "chat_instance": "1",
+                                "data": method,
+                                "from": {
+                                    "id": user.pk,
+                                    "is_bot": False,
+                                    "first_name": user.username,
+                                    "username": telegram_user.tg_username,
+                                },
+                                "message": {
+                                    "message_id": 1,
+                                    "date": 0,
+                                    "chat": {"id": user.pk, "type": "private"},
+                                },
+                            },
+                        },
+                        bot,
+                    )
+                    context = CallbackContext.from_update(update, dispatcher)
+
+                    bot.messages = 0
+                    timings, queries, _ = self._measure(
+                        lambda: getattr(handler, method)(update, context),
+                        options["repeat"],
+                    )
+                    results.append(
+                        {
+                            "handler": f"{handler.__name__}.{method}",
+                            "messages": bot.messages // options["repeat"],
+                            "queries": queries,
+                            **timing_stats(timings),
+                        }
+                    )
+
+            transaction.set_rollback(True)
+        return results
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["username"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(
+                f"User {options['username']} doesn't exist, "
+                + "create it with seed_data command"
+            )
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "username": user.username,
+            "repeat": options["repeat"],
+            "api": self._benchmark_api(user, options),
+            "bot": self._benchmark_bot(user, options),
+        }
+
+        content = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(content + "\n")
+        else:
+            self.stdout.write(content)
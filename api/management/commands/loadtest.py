@@ -0,0 +1,370 @@
+import asyncio
+import json
+import multiprocessing
+import random
+import sys
+import time
+from collections import defaultdict
+from importlib import import_module
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+    get_user_model,
+)
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import connections
+from django.utils.crypto import get_random_string
+
+from main.models import Asset, IncomeSource, ExpenseCategory
+
+
+LOCKED_MESSAGE = "database is locked"
+
+# endpoint name, method, URL template and relative weight
+READS = (
+    ("dashboard", "GET", "/api/common-info/", 4),
+    ("assets", "GET", "/api/assets/", 2),
+    ("asset outgoing", "GET", "/api/assets/{asset}/outgoing/", 2),
+    ("expense transactions", "GET", "/api/expense-transactions/", 2),
+    ("tags", "GET", "/api/tags/", 1),
+    ("search", "GET", "/api/search/?q=gro", 1),
+)
+WRITES = (
+    ("create expense", "POST", "/api/expense-transactions/", 3),
+    ("create income", "POST", "/api/income-transactions/", 1),
+    ("delete expense", "DELETE", "/api/expense-transactions/{pk}/", 3),
+)
+
+
+def percentile(ordered, share):
+    """
+    Nearest-rank percentile of sorted list.
+    """
+
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def _record_error(sender, request=None, **kwargs):
+    """
+    got_request_exception receiver: keep exception message in ASGI scope,
+        load driver reads it after response (body of 500 is generic).
+    """
+
+    scope = getattr(request, "scope", None)
+    if scope is not None:
+        scope["loadtest.error"] = f"{sys.exc_info()[1]}"
+
+
+class VirtualUser:
+    """
+    Session of one seeded user: cookies, CSRF token,
+        own objects and transactions created by the user.
+    """
+
+    def __init__(self, user, objects):
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+
+        # unsalted secret is accepted by CsrfViewMiddleware
+        self.csrf_token = get_random_string(32)
+        self.cookie = (
+            f"{settings.SESSION_COOKIE_NAME}={session.session_key}; "
+            + f"{settings.CSRF_COOKIE_NAME}={self.csrf_token}"
+        )
+        self.objects = objects
+        self.created = []
+
+
+class Driver:
+    """
+    Closed-loop load of one process: concurrency tasks send requests
+        to ASGI application without network until deadline.
+    """
+
+    def __init__(self, application, users, options):
+        self.application = application
+        # every process starts from its own user
+        index = options["index"] % len(users)
+        self.users = users[index:] + users[:index]
+        self.options = options
+        self.rnd = random.Random()
+        self.samples = defaultdict(list)
+
+    async def request(self, user, method, path, body=None):
+        path, _, query = path.partition("?")
+        raw = b"" if body is None else json.dumps(body).encode("utf-8")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": query.encode("utf-8"),
+            "root_path": "",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"cookie", user.cookie.encode("utf-8")),
+                (b"x-csrftoken", user.csrf_token.encode("utf-8")),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(raw)).encode("utf-8")),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        messages = [{"type": "http.request", "body": raw}]
+        response = {"status": None, "body": b""}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+
+        # channels router is ASGI 2: scope first, then receive and send
+        await self.application(scope)(receive, send)
+        return response["status"], response["body"], scope.get(
+            "loadtest.error"
+        )
+
+    def _next_request(self, user):
+        """
+        Pick weighted endpoint, write share is --writes,
+            deletes are used only for user's created transactions.
+        """
+
+        endpoints = (
+            WRITES if self.rnd.random() < self.options["writes"] else READS
+        )
+        if not user.created:
+            endpoints = [item for item in endpoints if "{pk}" not in item[2]]
+        name, method, url, _ = self.rnd.choices(
+            endpoints, weights=[item[3] for item in endpoints]
+        )[0]
+
+        objects = user.objects
+        body = None
+        if name == "create expense":
+            body = {
+                "asset": {"pk": self.rnd.choice(objects["assets"])},
+                "expense": {"pk": self.rnd.choice(objects["expenses"])},
+                "amount": f"{Decimal(self.rnd.randrange(100, 5000)) / 100}",
+            }
+        elif name == "create income":
+            body = {
+                "income": {"pk": self.rnd.choice(objects["incomes"])},
+                "asset": {"pk": self.rnd.choice(objects["assets"])},
+                "amount": f"{Decimal(self.rnd.randrange(100, 5000)) / 100}",
+            }
+        elif name == "delete expense":
+            url = url.format(pk=user.created.pop())
+        url = url.replace("{asset}", str(objects["assets"][0]))
+        return name, method, url, body
+
+    async def worker(self, user, deadline):
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            name, method, url, body = self._next_request(user)
+            started = time.perf_counter()
+            status, content, error = await self.request(
+                user, method, url, body
+            )
+            elapsed = time.perf_counter() - started
+
+            if name == "create expense" and status == 201:
+                user.created.append(json.loads(content)["pk"])
+            self.samples[name].append(
+                (elapsed, status, bool(error and LOCKED_MESSAGE in error))
+            )
+
+    async def run(self):
+        deadline = asyncio.get_running_loop().time() + self.options["duration"]
+        await asyncio.gather(
+            *(
+                self.worker(self.users[i % len(self.users)], deadline)
+                for i in range(self.options["concurrency"])
+            )
+        )
+        return dict(self.samples)
+
+
+def run_process(users, options):
+    """
+    Process entry point, every process opens own DB connection
+        and runs its event loop like separate daphne instance.
+    """
+
+    connections.close_all()
+    from finance.asgi import application
+
+    got_request_exception.connect(_record_error)
+    driver = Driver(application, users, options)
+    try:
+        return asyncio.run(driver.run())
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Closed-loop load of finance.asgi.application in-process: "
+        + "seeded users mix dashboard reads and transaction writes, "
+        + "report latency percentiles, throughput and locked errors"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="users are <prefix>-<number>, see seed_data command",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=2,
+            help="worker processes, each like one daphne instance",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="simultaneous requests per process",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="seconds"
+        )
+        parser.add_argument(
+            "--writes",
+            type=float,
+            default=0.2,
+            help="share of write requests, 0 for read only load",
+        )
+        parser.add_argument("--output", help="JSON report file")
+
+    @staticmethod
+    def _objects(users):
+        objects = defaultdict(lambda: defaultdict(list))
+        for key, model in (
+            ("assets", Asset),
+            ("incomes", IncomeSource),
+            ("expenses", ExpenseCategory),
+        ):
+            for user_id, pk in (
+                model.objects.filter(user__in=users)
+                .order_by("pk")
+                .values_list("user", "pk")
+            ):
+                objects[user_id][key].append(pk)
+        return objects
+
+    def _report(self, results, elapsed):
+        samples = defaultdict(list)
+        for result in results:
+            for name, items in result.items():
+                samples[name] += items
+        samples["total"] = [
+            item for name in list(samples) for item in samples[name]
+        ]
+
+        report = {}
+        for name, items in samples.items():
+            latencies = sorted(item[0] * 1000 for item in items)
+            statuses = defaultdict(int)
+            for _, status, _ in items:
+                statuses[str(status)] += 1
+            errors = sum(1 for _, status, _ in items if status >= 500)
+            locked = sum(1 for *_, is_locked in items if is_locked)
+            report[name] = {
+                "requests": len(items),
+                "throughput": round(len(items) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 0.5), 3),
+                "p95_ms": round(percentile(latencies, 0.95), 3),
+                "p99_ms": round(percentile(latencies, 0.99), 3),
+                "errors": errors,
+                "locked": locked,
+                "locked_rate": round(locked / len(items), 4),
+                "statuses": dict(statuses),
+            }
+        return report
+
+    def handle(self, *args, **options):
+        users = list(
+            get_user_model()
+            .objects.filter(username__startswith=f"{options['prefix']}-")
+            .order_by("pk")
+        )
+        objects = self._objects(users)
+        users = [
+            user
+            for user in users
+            if all(objects[user.pk][key] for key in ("assets", "incomes"))
+            and objects[user.pk]["expenses"]
+        ]
+        if not users:
+            raise CommandError(
+                f"There are no users with prefix {options['prefix']}, "
+                + "create them with seed_data command"
+            )
+
+        virtual_users = [
+            VirtualUser(user, dict(objects[user.pk])) for user in users
+        ]
+        driver_options = {
+            key: options[key] for key in ("concurrency", "duration", "writes")
+        }
+        # forked processes must not share SQLite connection
+        connections.close_all()
+
+        context = multiprocessing.get_context("fork")
+        with context.Pool(options["processes"]) as pool:
+            started = time.perf_counter()
+            results = pool.starmap(
+                run_process,
+                [
+                    (virtual_users, dict(driver_options, index=index))
+                    for index in range(options["processes"])
+                ],
+            )
+            elapsed = time.perf_counter() - started
+
+        report = self._report(results, elapsed)
+        for name, row in report.items():
+            self.stdout.write(
+                f"{name:<22} {row['requests']:>7} req "
+                + f"{row['throughput']:>8.1f} req/s "
+                + f"p50 {row['p50_ms']:>8.2f}ms "
+                + f"p95 {row['p95_ms']:>8.2f}ms "
+                + f"p99 {row['p99_ms']:>8.2f}ms "
+                + f"5xx {row['errors']:>5} "
+                + f"locked {row['locked_rate']:>7.2%}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(
+                    {
+                        "processes": options["processes"],
+                        "concurrency": options["concurrency"],
+                        "duration": options["duration"],
+                        "writes": options["writes"],
+                        "endpoints": report,
+                    },
+                    output,
+                    indent=2,
+                )
@@ -1,18 +1,127 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from main.utils import parse_moment
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in cursor pagination for transactions, keyed on
+        (created_at, id) with default "-created_at" ordering.
+
+    Every page is one index range lookup
+        created_at <= X AND NOT (created_at = X AND id >= Y)
+        with LIMIT, so there are no COUNT(*) and OFFSET scans
+        and page cost doesn't depend on scroll depth.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by("-created_at", "-id")
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at)
+                & ~Q(created_at=created_at, id__gte=pk)
+            )
+
+        page = list(queryset[: self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[: self.page_size]
+
+        self.next_position = self._get_position(page[-1]) if page else None
+        return page
+
+    @staticmethod
+    def _get_position(item):
+        """
+        Page items might be model instances or values() dicts.
+        """
+        if isinstance(item, dict):
+            return item["created_at"], item["id"]
+        return item.created_at, item.pk
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            created_at, pk = (
+                urlsafe_b64decode(encoded.encode("ascii"))
+                .decode("ascii")
+                .split("|", 1)
+            )
+            return parse_moment(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        created_at, pk = position
+        token = f"{created_at.isoformat()}|{pk}".encode("ascii")
+        return replace_query_param(
+            self.base_url,
+            self.cursor_query_param,
+            urlsafe_b64encode(token).decode("ascii"),
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
+
+
 # get from GenericAPIView
 #   https://github.com/encode/django-rest-framework/blob/master/rest_framework/generics.py
 class PaginationMixin(object):
+    # actions, which support opt-in "?cursor=" keyset pagination
+    cursor_actions = ()
+    cursor_pagination_class = KeysetPagination
+
     @property
     def paginator(self):
         """
         The paginator instance associated with the view, or `None`.
         """
         if not hasattr(self, "_paginator"):
-            if self.pagination_class is None:
+            if self.use_cursor_pagination:
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
                 self._paginator = None
             else:
                 self._paginator = self.pagination_class()
         return self._paginator
 
+    @property
+    def use_cursor_pagination(self):
+        """
+        Cursor mode is enabled by "cursor" query param,
+            empty value "?cursor=" requests the first page.
+        """
+        return (
+            getattr(self, "action", None) in self.cursor_actions
+            and KeysetPagination.cursor_query_param
+            in self.request.query_params
+        )
+
     def paginate_queryset(self, queryset):
         """
         Return a single page of results, or `None` if pagination is disabled.
@@ -1,7 +1,7 @@
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.permissions import BasePermission
 
 from api.exceptions import ForbiddenException, NotFoundException
+from api.loaders import get_loader
 
 
 class IsAuthenticated(BasePermission):
@@ -21,14 +21,16 @@ class IsOwner(BasePermission):
         super().__init__()
 
     def has_permission(self, request, view):
-        try:
-            obj = self.model.objects.select_related().get(
-                pk=view.kwargs.get("pk")
-            )
-        except ObjectDoesNotExist:
+        """
+        Object is stored in request identity map,
+            so viewset doesn't fetch it again.
+        """
+
+        obj = get_loader(request).load(self.model, view.kwargs.get("pk"))
+        if obj is None:
             raise NotFoundException()
 
-        if obj.user == request.user:
+        if obj.user_id == request.user.pk:
             return True
 
         raise ForbiddenException()
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from api.consumers import BalanceConsumer
+
+
+websocket_urlpatterns = [
+    path("api/ws/balances/", BalanceConsumer),
+]
@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from rest_framework import serializers
 from main.models import (
     Asset,
@@ -8,7 +10,39 @@ from main.models import (
 )
 
 
-class AssetSerializer(serializers.ModelSerializer):
+def model_field_names(serializer):
+    """
+    Model columns, which are required to render serializer fields,
+        "get_<field>_display" sources are resolved to "<field>".
+    """
+
+    names = {field.name for field in serializer.Meta.model._meta.fields}
+    columns = []
+    for field in serializer.fields.values():
+        source = field.source
+        if source.startswith("get_") and source.endswith("_display"):
+            source = source[len("get_") : -len("_display")]
+        if source == "pk" or source in names:
+            columns.append(source)
+    return columns
+
+
+class SparseFieldsMixin(object):
+    """
+    Serializer mixin with "fields" argument,
+        which limits output to requested field names.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class AssetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     explained_type = serializers.CharField(
         source="get_type_display", read_only=True
     )
@@ -18,13 +52,13 @@ class AssetSerializer(serializers.ModelSerializer):
         fields = ("pk", "description", "balance", "type", "explained_type")
 
 
-class IncomeSerializer(serializers.ModelSerializer):
+class IncomeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = IncomeSource
         fields = ("pk", "description")
 
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ExpenseCategory
         fields = ("pk", "description", "monthly_limit")
@@ -46,3 +80,107 @@ class ExpenseTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExpenseTransaction
         fields = "__all__"
+
+
+class FlatTransactionSerializer:
+    """
+    Read-only fast path for transaction lists and details.
+
+    Rows are built from values() dicts instead of model instances,
+        every referenced asset or category is fetched with one
+        pk__in query per model and serialized only once per response.
+    Without "fields" and "expand" JSON shape is the same
+        as wrapped ModelSerializer produces.
+
+    Optional request identity map (api.loaders) shares
+        already loaded objects with permissions and viewsets.
+
+    Sparse mode is enabled by "fields" or "expand" arguments:
+        output contains only requested fields, and related objects
+        are presented by pk unless they're listed in "expand",
+        so there are no extra columns, queries and nested serializers.
+    """
+
+    def __init__(
+        self, serializer_class, fields=None, expand=None, loader=None
+    ):
+        self.loader = loader
+        all_fields = serializer_class().fields
+        related = {
+            name
+            for name, field in all_fields.items()
+            if isinstance(field, serializers.BaseSerializer)
+        }
+
+        sparse = fields is not None or expand is not None
+        self.fields = OrderedDict(
+            (name, field)
+            for name, field in all_fields.items()
+            if fields is None or name in fields
+        )
+        self.related = {
+            name: field
+            for name, field in self.fields.items()
+            if name in related
+        }
+        self.expand = (
+            set(self.related) & set(expand or ())
+            if sparse
+            else set(self.related)
+        )
+
+    def values_fields(self, *required):
+        """
+        Arguments for queryset values() call,
+            required columns are added even if they aren't requested.
+        """
+
+        columns = [
+            f"{name}_id" if name in self.related else field.source
+            for name, field in self.fields.items()
+        ]
+        return columns + [name for name in required if name not in columns]
+
+    def _related_representations(self, rows):
+        """
+        Serialize every expanded object once: {field: {pk: data}}.
+        """
+
+        representations = {}
+        for name in self.expand:
+            serializer = self.related[name]
+            model = serializer.Meta.model
+            pks = {row[f"{name}_id"] for row in rows}
+            objects = (
+                model.objects.in_bulk(pks)
+                if self.loader is None
+                else self.loader.load_many(model, pks)
+            )
+            representations[name] = {
+                pk: serializer.to_representation(obj)
+                for pk, obj in objects.items()
+                if obj is not None
+            }
+        return representations
+
+    def data(self, rows):
+        rows = list(rows)
+        related = self._related_representations(rows)
+
+        result = []
+        for row in rows:
+            item = OrderedDict()
+            for name, field in self.fields.items():
+                if name in self.expand:
+                    item[name] = related[name].get(row[f"{name}_id"])
+                    continue
+                if name in self.related:
+                    item[name] = row[f"{name}_id"]
+                    continue
+
+                value = row[field.source]
+                item[name] = (
+                    None if value is None else field.to_representation(value)
+                )
+            result.append(item)
+        return result
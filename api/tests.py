@@ -1,3 +1,960 @@
-from django.test import TestCase
+from datetime import timedelta
+import asyncio
+import csv
+import json
+import logging
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import (
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.consumers import BalanceConsumer, ExportConsumer
+from api.exports import async_chunks
+from api.loaders import ObjectLoader
+from api.serializers import (
+    ExpenseTransactionSerializer,
+    IncomeTransactionSerializer,
+)
+from main.utils import month_bounds
+from main.models import (
+    Asset,
+    IncomeSource,
+    ExpenseCategory,
+    ExpenseMonthlyTotal,
+    IncomeTransaction,
+    ExpenseTransaction,
+)
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+INMEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class InformationSetTest(TestCase):
+    # session, user, data version, assets,
+    # income sources, income totals, expense categories, expense totals
+    QUERIES = 8
+
+    @staticmethod
+    def _create_user(username, categories):
+        user = get_user_model().objects.create(username=username)
+        asset = Asset.objects.create(user=user, description="card")
+        for i in range(categories):
+            income = IncomeSource.objects.create(
+                user=user, description=f"income {i}"
+            )
+            expense = ExpenseCategory.objects.create(
+                user=user, description=f"expense {i}", monthly_limit=100
+            )
+            IncomeTransaction(asset=asset, income=income, amount=10).save()
+            ExpenseTransaction(asset=asset, expense=expense, amount=3).save()
+        return user
+
+    def _get_summary(self, user):
+        cache.clear()
+        self.client.force_login(user)
+        with self.assertNumQueries(self.QUERIES):
+            response = self.client.get("/api/common-info/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_queries_count_does_not_depend_on_categories(self):
+        for username, categories in (("few", 2), ("many", 40)):
+            summary = self._get_summary(
+                self._create_user(username, categories)
+            )
+            self.assertEqual(len(summary["incomes"]), categories)
+            self.assertEqual(len(summary["expenses"]), categories)
+            self.assertEqual(
+                {v["balance"] for v in summary["incomes"]}, {10.0}
+            )
+            self.assertEqual(
+                {v["balance"] for v in summary["expenses"]}, {3.0}
+            )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConcurrentInformationSetTest(TransactionTestCase):
+    """
+    Summary parts are read by pool threads with own DB connections,
+        so data must be committed.
+    """
+
+    def test_summary_equals_sequential_one(self):
+        user = InformationSetTest._create_user("async", 3)
+        IncomeSource.objects.create(user=user, description="unused")
+        self.client.force_login(user)
+
+        summaries = []
+        for url in ("/api/common-info/", "/api/common-info-async/"):
+            # both endpoints share cached payload
+            cache.clear()
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            summaries.append(response.json())
+
+        self.assertEqual(summaries[0], summaries[1])
+        self.assertEqual(len(summaries[1]["incomes"]), 4)
+        self.assertEqual(
+            {value["balance"] for value in summaries[1]["expenses"]}, {3.0}
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ETagTest(TransactionTestCase):
+    """
+    Data version is bumped after commit, so test uses real transactions.
+    """
+
+    def test_not_modified_until_write_or_month_change(self):
+        user = get_user_model().objects.create(username="etag")
+        asset = Asset.objects.create(user=user, description="card")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        self.client.force_login(user)
+
+        response = self.client.get("/api/common-info/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.client.get(
+            "/api/common-info/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        ExpenseTransaction(asset=asset, expense=expense, amount=3).save()
+        response = self.client.get(
+            "/api/common-info/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["expenses"][0]["balance"], 3.0)
+        etag = response["ETag"]
+
+        # session must stay valid, so only local time is shifted
+        localtime = timezone.localtime
+        with mock.patch(
+            "django.utils.timezone.localtime",
+            lambda value=None, *args: localtime(
+                value or timezone.now() + timedelta(days=32), *args
+            ),
+        ):
+            response = self.client.get(
+                "/api/common-info/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["expenses"][0]["balance"], 0.0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ModelListTest(TestCase):
+    def test_list_contains_only_user_objects(self):
+        users = [
+            get_user_model().objects.create(username=f"user {i}")
+            for i in range(2)
+        ]
+        for user in users:
+            for i in range(3):
+                Asset.objects.create(user=user, description=f"asset {i}")
+
+        self.client.force_login(users[0])
+        response = self.client.get("/api/assets/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(
+            {asset["pk"] for asset in response.json()["results"]},
+            set(
+                Asset.objects.filter(user=users[0]).values_list(
+                    "pk", flat=True
+                )
+            ),
+        )
+
+        new_user = get_user_model().objects.create(username="new")
+        self.client.force_login(new_user)
+        self.assertEqual(self.client.get("/api/assets/").status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchSetTest(TestCase):
+    def test_sub_requests_are_dispatched_in_order(self):
+        user = get_user_model().objects.create(username="batch")
+        asset = Asset.objects.create(user=user, description="card")
+        self.client.force_login(user)
+
+        response = self.client.post(
+            "/api/batch/",
+            [
+                {"url": f"/api/assets/{asset.pk}/"},
+                {"url": "/api/assets/", "method": "POST", "body": {}},
+                {"url": "/api/batch/", "method": "POST"},
+                {"url": "/rest-auth/user/"},
+            ],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(
+            [result["status"] for result in results], [200, 400, 400, 400]
+        )
+        self.assertEqual(results[0]["body"]["description"], "card")
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, CHANNEL_LAYERS=INMEMORY_CHANNEL_LAYERS
+)
+class BalancePushTest(TransactionTestCase):
+    """
+    Messages are sent after commit, so test uses real transactions,
+        whole WebSocket session runs inside one event loop.
+    """
+
+    def _connect(self, user=None):
+        communicator = WebsocketCommunicator(
+            BalanceConsumer, "/api/ws/balances/"
+        )
+        if user is not None:
+            communicator.scope["user"] = user
+        return communicator
+
+    def test_transaction_change_is_pushed_to_owner(self):
+        user = get_user_model().objects.create(username="push")
+        asset = Asset.objects.create(user=user, description="card")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        item = ExpenseTransaction(asset=asset, expense=expense, amount=3)
+
+        async def session():
+            communicator = self._connect(user)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            await sync_to_async(item.save)()
+            saved = await communicator.receive_json_from()
+            await sync_to_async(item.delete)()
+            deleted = await communicator.receive_json_from()
+
+            await communicator.disconnect()
+            return saved, deleted
+
+        saved, deleted = async_to_sync(session)()
+        self.assertEqual(
+            saved,
+            {
+                "assets": [{"pk": asset.pk, "balance": "-3.0000"}],
+                "incomes": [],
+                "expenses": [{"pk": expense.pk, "balance": 3.0}],
+            },
+        )
+        self.assertEqual(deleted["assets"][0]["balance"], "0.0000")
+        self.assertEqual(deleted["expenses"][0]["balance"], 0.0)
+
+    def test_payload_is_not_built_without_local_consumers(self):
+        user = get_user_model().objects.create(username="silent")
+        asset = Asset.objects.create(user=user, description="card")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        with mock.patch("main.push.balances_payload") as payload:
+            ExpenseTransaction(asset=asset, expense=expense, amount=3).save()
+        payload.assert_not_called()
+
+    def test_anonymous_connection_is_closed(self):
+        async def session():
+            connected, _ = await self._connect().connect()
+            return connected
+
+        self.assertFalse(async_to_sync(session)())
+
+
+class SearchSetTest(TestCase):
+    def _create_expense(self, username, tags):
+        user = get_user_model().objects.create(username=username)
+        asset = Asset.objects.create(user=user, description="card")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="health", monthly_limit=100
+        )
+        ExpenseTransaction(
+            asset=asset, expense=expense, amount=5, tags=tags
+        ).save()
+        return user, expense
+
+    def test_prefix_search_returns_only_user_transactions(self):
+        user, expense = self._create_expense("first", "pharmacy,аптека")
+        self._create_expense("second", "pharmacy")
+        self.client.force_login(user)
+
+        for query in ("pharm", "апт", "heal card"):
+            results = self.client.get("/api/search/", {"q": query}).json()[
+                "results"
+            ]
+            self.assertEqual(len(results), 1)
+            self.assertEqual(results[0]["category_id"], expense.pk)
+            self.assertEqual(results[0]["amount"], "5.0000")
+
+        expense.description = "medicine"
+        expense.save()
+        results = self.client.get("/api/search/", {"q": "medic"}).json()
+        self.assertEqual(len(results["results"]), 1)
+        self.assertEqual(
+            self.client.get("/api/search/", {"q": "("}).json()["results"], []
+        )
+
+
+class TagSetTest(TestCase):
+    def test_totals_are_grouped_by_exact_tag(self):
+        user = get_user_model().objects.create(username="tags")
+        asset = Asset.objects.create(user=user, description="card")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        ExpenseTransaction(
+            asset=asset, expense=expense, amount=5, tags="Lunch, work,lunch"
+        ).save()
+        ExpenseTransaction.bulk_save(
+            [
+                ExpenseTransaction(
+                    asset=asset, expense=expense, amount=2, tags="lunchbox"
+                )
+                for _ in range(3)
+            ]
+        )
+
+        self.client.force_login(user)
+        self.assertEqual(
+            self.client.get("/api/tags/").json(),
+            [
+                {"name": "lunchbox", "amount": 6.0, "count": 3},
+                {"name": "lunch", "amount": 5.0, "count": 1},
+                {"name": "work", "amount": 5.0, "count": 1},
+            ],
+        )
+        self.assertEqual(
+            self.client.get("/api/tags/", {"to": "2020-01-01"}).json(), []
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TransactionBatchTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="batch")
+        self.asset = Asset.objects.create(user=self.user, description="card")
+        self.expense = ExpenseCategory.objects.create(
+            user=self.user, description="food", monthly_limit=100
+        )
+        self.client.force_login(self.user)
+
+    def _item(self, amount, asset=None):
+        return {
+            "asset": {"pk": (asset or self.asset).pk},
+            "expense": {"pk": self.expense.pk},
+            "amount": amount,
+        }
+
+    def _post(self, items):
+        return self.client.post(
+            "/api/expense-transactions/batch/",
+            items,
+            content_type="application/json",
+        )
+
+    def test_balance_gets_one_aggregated_delta(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post([self._item(a) for a in ("1.5", "2", "3")])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"count": 3})
+        balance_updates = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "main_asset"')
+        ]
+        self.assertEqual(len(balance_updates), 1)
+
+        self.asset.refresh_from_db()
+        self.assertEqual(self.asset.balance, -Decimal("6.5"))
+        self.assertEqual(
+            ExpenseMonthlyTotal.objects.get(expense=self.expense).amount,
+            Decimal("6.5"),
+        )
+
+    def test_invalid_item_rolls_back_whole_batch(self):
+        stranger = get_user_model().objects.create(username="stranger")
+        foreign = Asset.objects.create(user=stranger, description="card")
+
+        for items, status in (
+            ([self._item("1"), self._item("not a number")], 400),
+            ([self._item("1"), self._item("2", asset=foreign)], 404),
+        ):
+            self.assertEqual(self._post(items).status_code, status)
+
+        self.assertFalse(ExpenseTransaction.objects.exists())
+        self.asset.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual((self.asset.balance, foreign.balance), (0, 0))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTest(TestCase):
+    def test_cursor_pages_have_no_duplicates_and_gaps(self):
+        user = get_user_model().objects.create(username="cursor")
+        asset = Asset.objects.create(user=user, description="card")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        ExpenseTransaction.bulk_save(
+            [
+                ExpenseTransaction(asset=asset, expense=expense, amount=1)
+                for _ in range(45)
+            ]
+        )
+        # groups of equal created_at cross page boundaries
+        moment = timezone.now()
+        for pk in ExpenseTransaction.objects.values_list("pk", flat=True):
+            ExpenseTransaction.objects.filter(pk=pk).update(
+                created_at=moment - timedelta(minutes=pk // 7)
+            )
+        expected = list(
+            ExpenseTransaction.objects.order_by(
+                "-created_at", "-id"
+            ).values_list("pk", flat=True)
+        )
+
+        self.client.force_login(user)
+        url, pages = "/api/expense-transactions/?cursor=", []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row["id"] for row in response.json()["results"]])
+            url = response.json()["next"]
+
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual(
+            self.client.get(
+                "/api/expense-transactions/", {"cursor": "bm90LWEtZGF0ZXwx"}
+            ).status_code,
+            404,
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExportSetTest(TransactionTestCase):
+    """
+    Consumer reads rows by producer thread with own DB connection,
+        so data must be committed.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="export")
+        asset = Asset.objects.create(user=self.user, description="card")
+        income = IncomeSource.objects.create(
+            user=self.user, description="salary"
+        )
+        expense = ExpenseCategory.objects.create(
+            user=self.user, description="food", monthly_limit=100
+        )
+        IncomeTransaction(asset=asset, income=income, amount=10).save()
+        ExpenseTransaction.bulk_save(
+            [
+                ExpenseTransaction(
+                    asset=asset, expense=expense, amount=i, tags="milk"
+                )
+                for i in range(1, 4)
+            ]
+        )
+        self.client.force_login(self.user)
+
+    def _export(self, **params):
+        response = self.client.get("/api/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson_and_csv_contain_all_transactions(self):
+        response, content = self._export()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(row["type"], row["amount"]) for row in rows],
+            [
+                ("income", "10.0000"),
+                ("expense", "1.0000"),
+                ("expense", "2.0000"),
+                ("expense", "3.0000"),
+            ],
+        )
+        self.assertEqual(rows[1]["category"], "food")
+        self.assertEqual(rows[1]["tags"], "milk")
+
+        response, content = self._export(output="csv", type="expense")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(
+            [row["amount"] for row in rows], ["1.0000", "2.0000", "3.0000"]
+        )
+        self.assertEqual({row["asset"] for row in rows}, {"card"})
+
+        self.assertEqual(
+            self.client.get("/api/export/", {"output": "xml"}).status_code,
+            400,
+        )
+
+    def _consume(self, path, user):
+        async def session():
+            communicator = HttpCommunicator(ExportConsumer, "GET", path)
+            communicator.scope["user"] = user
+            await communicator.send_input({"type": "http.request"})
+            start = await communicator.receive_output(5)
+            parts = []
+            while True:
+                message = await communicator.receive_output(5)
+                parts.append(message["body"])
+                if not message.get("more_body"):
+                    return start["status"], parts
+
+        return async_to_sync(session)()
+
+    def test_consumer_streams_export_larger_than_chunk(self):
+        asset = Asset.objects.get(user=self.user)
+        expense = ExpenseCategory.objects.get(user=self.user)
+        ExpenseTransaction.bulk_save(
+            [
+                ExpenseTransaction(asset=asset, expense=expense, amount=1)
+                for _ in range(1200)
+            ]
+        )
+
+        status, parts = self._consume(
+            "/api/export/?type=expense&output=csv", self.user
+        )
+        self.assertEqual(status, 200)
+        # header with 500 rows, 500 rows, 203 rows and closing message
+        self.assertEqual(len(parts), 4)
+        rows = list(csv.DictReader(b"".join(parts).decode().splitlines()))
+        self.assertEqual(len(rows), 1203)
+        self.assertEqual(len({row["id"] for row in rows}), 1203)
+
+        status, _ = self._consume("/api/export/?output=xml", self.user)
+        self.assertEqual(status, 400)
+
+    def test_producer_does_not_block_event_loop(self):
+        released = threading.Event()
+
+        def lines():
+            # producer waits for coroutine of the same event loop
+            released.wait(5)
+            yield "line\n"
+
+        async def consume():
+            async def release():
+                await asyncio.sleep(0.01)
+                released.set()
+
+            releaser = asyncio.ensure_future(release())
+            chunks = [chunk async for chunk in async_chunks(lines())]
+            await releaser
+            return chunks
+
+        started = time.monotonic()
+        self.assertEqual(async_to_sync(consume)(), ["line\n"])
+        self.assertLess(time.monotonic() - started, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FlatTransactionSerializerTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="flat")
+        self.asset = Asset.objects.create(user=self.user, description="card")
+        self.income = IncomeSource.objects.create(
+            user=self.user, description="salary"
+        )
+        self.expense = ExpenseCategory.objects.create(
+            user=self.user, description="food", monthly_limit=100
+        )
+        IncomeTransaction(
+            asset=self.asset, income=self.income, amount=10
+        ).save()
+        for amount in (1, 2.5):
+            ExpenseTransaction(
+                asset=self.asset,
+                expense=self.expense,
+                amount=amount,
+                tags="milk",
+            ).save()
+        self.client.force_login(self.user)
+
+    def _model_serializer_shape(self, serializer_class, queryset):
+        return json.loads(
+            JSONRenderer().render(serializer_class(queryset, many=True).data)
+        )
+
+    def test_shape_equals_model_serializer(self):
+        for url, serializer_class, model in (
+            (
+                "/api/income-transactions/",
+                IncomeTransactionSerializer,
+                IncomeTransaction,
+            ),
+            (
+                "/api/expense-transactions/",
+                ExpenseTransactionSerializer,
+                ExpenseTransaction,
+            ),
+        ):
+            expected = self._model_serializer_shape(
+                serializer_class, model.objects.order_by("-created_at", "-id")
+            )
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["results"], expected)
+
+            response = self.client.get(f"{url}{expected[0]['id']}/")
+            self.assertEqual(response.json(), expected[0])
+
+    def test_sparse_fields_and_expand(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                "/api/assets/", {"fields": "pk,description,unknown"}
+            )
+        self.assertEqual(
+            response.json()["results"],
+            [{"pk": self.asset.pk, "description": "card"}],
+        )
+        # only() narrows columns of requested fields
+        select = next(
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith('SELECT "main_asset"."id"')
+        )
+        self.assertIn('"main_asset"."description"', select)
+        self.assertNotIn('"main_asset"."balance"', select)
+
+        url = "/api/expense-transactions/"
+        rows = self.client.get(
+            url, {"fields": "amount,asset,expense,unknown"}
+        ).json()["results"]
+        self.assertEqual(
+            rows[0],
+            {
+                "amount": "2.5000",
+                "asset": self.asset.pk,
+                "expense": self.expense.pk,
+            },
+        )
+
+        rows = self.client.get(
+            url, {"fields": "amount,asset,expense", "expand": "asset,tags"}
+        ).json()["results"]
+        self.assertEqual(rows[0]["asset"]["description"], "card")
+        self.assertEqual(rows[0]["expense"], self.expense.pk)
+        self.assertEqual(set(rows[0]), {"amount", "asset", "expense"})
+
+        rows = self.client.get(url, {"expand": "expense"}).json()["results"]
+        self.assertEqual(rows[0]["asset"], self.asset.pk)
+        self.assertEqual(rows[0]["expense"]["description"], "food")
+        self.assertEqual(rows[0]["tags"], "milk")
+
+
+class ObjectLoaderTest(TestCase):
+    def test_objects_are_loaded_with_one_query_per_model(self):
+        user = get_user_model().objects.create(username="loader")
+        assets = [
+            Asset.objects.create(user=user, description=f"asset {i}")
+            for i in range(5)
+        ]
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        loader = ObjectLoader()
+
+        with self.assertNumQueries(1) as context:
+            loaded = loader.load_many(
+                Asset, [str(asset.pk) for asset in assets] + ["x", 999]
+            )
+        self.assertIn('"main_asset"."id" IN (', context[0]["sql"])
+        self.assertEqual(
+            [loaded[str(asset.pk)] for asset in assets], assets
+        )
+        self.assertIsNone(loaded["x"])
+        self.assertIsNone(loaded[999])
+
+        # loaded and missing keys are not fetched again
+        with self.assertNumQueries(0):
+            self.assertEqual(loader.load(Asset, assets[0].pk), assets[0])
+            self.assertIsNone(loader.load(Asset, 999))
+
+        loader.prime(expense)
+        with self.assertNumQueries(1):
+            loaded = loader.load_many(
+                ExpenseCategory, [expense.pk, expense.pk + 1]
+            )
+            loader.load_many(Asset, [asset.pk for asset in assets])
+        self.assertEqual(loaded[expense.pk], expense)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CategoryHistoryTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="history")
+        asset = Asset.objects.create(user=self.user, description="card")
+        self.expense = ExpenseCategory.objects.create(
+            user=self.user, description="food", monthly_limit=100
+        )
+        ExpenseTransaction.bulk_save(
+            [
+                ExpenseTransaction(
+                    asset=asset, expense=self.expense, amount=i
+                )
+                for i in range(1, 26)
+            ]
+        )
+        # the first 10 transactions belong to previous month
+        self.previous = month_bounds()[0] - timedelta(days=1)
+        ExpenseTransaction.objects.filter(
+            pk__in=ExpenseTransaction.objects.order_by("pk").values("pk")[
+                :10
+            ]
+        ).update(created_at=self.previous)
+        self.url = f"/api/expenses/{self.expense.pk}/incoming/"
+        self.client.force_login(self.user)
+
+    def test_history_pages(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()["count"], 25)
+        self.assertEqual(len(response.json()["results"]), 20)
+
+        # next links keep scheme of TLS terminating proxy
+        url, ids = f"{self.url}?cursor=", []
+        while url:
+            response = self.client.get(url, HTTP_X_FORWARDED_PROTO="https")
+            self.assertEqual(response.status_code, 200)
+            ids += [row["id"] for row in response.json()["results"]]
+            url = response.json()["next"]
+            if url:
+                self.assertTrue(url.startswith("https://"))
+        self.assertEqual(
+            ids,
+            list(
+                ExpenseTransaction.objects.order_by(
+                    "-created_at", "-id"
+                ).values_list("pk", flat=True)
+            ),
+        )
+
+        stranger = get_user_model().objects.create(username="stranger")
+        self.client.force_login(stranger)
+        self.assertNotEqual(self.client.get(self.url).status_code, 200)
+
+    def test_month_summary(self):
+        response = self.client.get(self.url, {"summary": "month"})
+        self.assertEqual(response.status_code, 200)
+        now = timezone.localtime()
+        self.assertEqual(
+            [
+                (row["month"], float(row["amount"]), row["count"])
+                for row in response.json()
+            ],
+            [
+                (f"{now.year}-{now.month:02}", 270.0, 15),
+                (self.previous.strftime("%Y-%m"), 55.0, 10),
+            ],
+        )
+
+        # period bounds are applied before grouping
+        response = self.client.get(
+            self.url,
+            {"summary": "month", "from": month_bounds()[0].isoformat()},
+        )
+        self.assertEqual([row["count"] for row in response.json()], [15])
+
+        response = self.client.get(self.url, {"summary": "week"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConcurrentWritesTest(TransactionTestCase):
+    """
+    Writers are threads with own DB connections and committed data.
+        In-memory test database locks whole tables, so part of writes
+        fail with "table is locked", balance must match the rest.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="writers")
+        self.asset = Asset.objects.create(user=self.user, description="card")
+        self.expense = ExpenseCategory.objects.create(
+            user=self.user, description="food", monthly_limit=100
+        )
+
+    def _balance(self):
+        self.asset.refresh_from_db(fields=["balance"])
+        return self.asset.balance
+
+    def test_parallel_api_writes_keep_balance(self):
+        clients = []
+        for _ in range(4):
+            client = Client()
+            client.force_login(self.user)
+            clients.append(client)
+        body = {
+            "asset": {"pk": self.asset.pk},
+            "expense": {"pk": self.expense.pk},
+            "amount": "1.25",
+        }
+        statuses = []
+
+        def write(client):
+            created = 0
+            try:
+                for _ in range(200):
+                    try:
+                        response = client.post(
+                            "/api/expense-transactions/",
+                            body,
+                            content_type="application/json",
+                        )
+                    except OperationalError:
+                        continue
+                    statuses.append(response.status_code)
+                    created += 1
+                    if created == 5:
+                        return
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=write, args=(client,))
+            for client in clients
+        ]
+        # locked writes are expected, they aren't logged
+        with mock.patch.object(
+            logging.getLogger("django.request"), "disabled", True
+        ):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(statuses, [201] * 20)
+        count = ExpenseTransaction.objects.count()
+        self.assertEqual(self._balance(), Decimal("-1.25") * count)
+        self.assertEqual(
+            ExpenseMonthlyTotal.objects.get(expense=self.expense).amount,
+            Decimal("1.25") * count,
+        )
+
+    def test_stale_asset_instance_does_not_lose_update(self):
+        # second writer has read asset before the first one committed
+        stale = Asset.objects.get(pk=self.asset.pk)
+        ExpenseTransaction(
+            asset=self.asset, expense=self.expense, amount=3
+        ).save()
+        with CaptureQueriesContext(connection) as context:
+            ExpenseTransaction(
+                asset=stale, expense=self.expense, amount=5
+            ).save()
+
+        self.assertEqual(self._balance(), -8)
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "main_asset"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn(
+            '"balance" = CAST(("main_asset"."balance" + ', updates[0]
+        )
+        self.assertNotIn('"description"', updates[0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PeriodFilterTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create(username="period")
+        self.asset = Asset.objects.create(user=user, description="card")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        self.start, self.end = month_bounds()
+        self.items = {}
+        for name, moment in (
+            ("before", self.start - timedelta(microseconds=1)),
+            ("start", self.start),
+            ("last", self.end - timedelta(microseconds=1)),
+            ("end", self.end),
+        ):
+            item = ExpenseTransaction(
+                asset=self.asset, expense=expense, amount=1
+            )
+            item.save()
+            ExpenseTransaction.objects.filter(pk=item.pk).update(
+                created_at=moment
+            )
+            self.items[item.pk] = name
+        self.client.force_login(user)
+
+    def _names(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return {self.items[row["id"]] for row in response.json()["results"]}
+
+    def test_bounds_are_half_open(self):
+        period = {
+            "from": self.start.isoformat(),
+            "to": self.end.isoformat(),
+        }
+        for url in (
+            "/api/expense-transactions/",
+            f"/api/assets/{self.asset.pk}/outgoing/",
+        ):
+            self.assertEqual(self._names(url, **period), {"start", "last"})
+            self.assertEqual(
+                self._names(url, to=self.start.isoformat()), {"before"}
+            )
+            self.assertEqual(
+                self._names(url, **{"from": self.end.isoformat()}), {"end"}
+            )
+
+        # date means midnight of current timezone
+        self.assertEqual(
+            self._names(
+                "/api/expense-transactions/",
+                **{"from": self.start.date().isoformat()},
+            ),
+            {"start", "last", "end"},
+        )
+
+    def test_invalid_bounds_are_bad_request(self):
+        for params in (
+            {"from": "yesterday"},
+            {"to": "2020-13-01"},
+            {"from": "2020-02-30"},
+            {"to": "2020-01-01T25:00:00"},
+        ):
+            for url in (
+                "/api/expense-transactions/",
+                f"/api/assets/{self.asset.pk}/outgoing/",
+            ):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400, (url, params))
@@ -3,20 +3,34 @@ from rest_framework import routers
 
 from api.views import (
     InformationSet,
+    ConcurrentInformationSet,
     AssetSet,
     IncomeSet,
     ExpenseSet,
     IncomeTransactionSet,
     ExpenseTransactionSet,
+    ExportSet,
+    BatchSet,
+    SearchSet,
+    TagSet,
 )
 
 router = routers.SimpleRouter()
 router.register(r"common-info", InformationSet)
+router.register(
+    r"common-info-async",
+    ConcurrentInformationSet,
+    basename="common-info-async",
+)
 router.register(r"assets", AssetSet)
 router.register(r"incomes", IncomeSet)
 router.register(r"expenses", ExpenseSet)
 router.register(r"income-transactions", IncomeTransactionSet)
 router.register(r"expense-transactions", ExpenseTransactionSet)
+router.register(r"export", ExportSet, basename="export")
+router.register(r"batch", BatchSet, basename="batch")
+router.register(r"search", SearchSet, basename="search")
+router.register(r"tags", TagSet, basename="tags")
 
 app_name = "api"
 urlpatterns = [
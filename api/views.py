@@ -1,14 +1,21 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Sum
-from django.http import JsonResponse
+from django.db import close_old_connections
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
 
 from rest_framework import status, viewsets, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 from main.models import (
     Asset,
@@ -16,8 +23,18 @@ from main.models import (
     ExpenseCategory,
     IncomeTransaction,
     ExpenseTransaction,
+    IncomeMonthlyTotal,
+    ExpenseMonthlyTotal,
+    ExpenseTransactionTag,
 )
+from main.cache import get_dashboard, set_dashboard
+from main.search import search_transactions
+from main.utils import month_bounds, period_bounds, period_filter
 from api.exceptions import NotFoundException, BadRequestException
+from api.batch import dispatch
+from api.etags import ETagMixin
+from api.loaders import get_loader
+from api.exports import export_lines
 from api.paginations import PaginationMixin
 from api.permissions import IsAuthenticated, IsOwner
 from api.serializers import (
@@ -26,10 +43,71 @@ from api.serializers import (
     ExpenseSerializer,
     IncomeTransactionSerializer,
     ExpenseTransactionSerializer,
+    FlatTransactionSerializer,
+    model_field_names,
 )
 
 
-class InformationSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+def request_period(request, field="created_at", default=None):
+    """
+    Return created_at filter arguments for "?from=&to=" params,
+        bounds are half-open: from <= created_at < to.
+    Default (start, end) bounds are used when both params are omitted.
+    """
+
+    try:
+        start, end = period_bounds(
+            request.query_params.get("from"), request.query_params.get("to")
+        )
+    except ValueError:
+        raise BadRequestException()
+    if start is None and end is None and default is not None:
+        start, end = default
+    return period_filter(start, end, field=field)
+
+
+def request_fields(request):
+    """
+    Parse comma separated "?fields=" and "?expand=" params,
+        None means that param isn't passed.
+    """
+
+    return tuple(
+        None
+        if value is None
+        else [name.strip() for name in value.split(",") if name.strip()]
+        for value in (
+            request.query_params.get("fields"),
+            request.query_params.get("expand"),
+        )
+    )
+
+
+def monthly_summary(queryset):
+    """
+    Group transactions by calendar month in SQL,
+        return list of {"month", "amount", "count"} newest first.
+    """
+
+    rows = (
+        queryset.annotate(month=TruncMonth("created_at"))
+        .values("month")
+        .annotate(amount=Sum("amount"), count=Count("id"))
+        .order_by("-month")
+    )
+    return [
+        {
+            "month": row["month"].strftime("%Y-%m"),
+            "amount": row["amount"],
+            "count": row["count"],
+        }
+        for row in rows
+    ]
+
+
+class InformationSet(
+    ETagMixin, mixins.ListModelMixin, viewsets.GenericViewSet
+):
     queryset = Asset.objects.select_related().all()
     permission_classes = [IsAuthenticated]
 
@@ -40,70 +118,136 @@ class InformationSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         - incomes with summary operations for latest month
         - expenses with summary operations for latest month
 
-        Heavy method with many SQL requests (8 requests),
-        of course "created_at" is an indexed field.
+        Payload is cached per user and invalidated on every
+        write of user's categories or transactions (see main.cache).
         """
 
-        assets = self.queryset.filter(user=request.user)
+        payload = get_dashboard(request.user.pk)
+        if payload is None:
+            payload = self.summary(request.user)
+            set_dashboard(request.user.pk, payload)
+        return Response(payload)
 
-        # calculate incomes categories for a month
-        incomes = IncomeSource.objects.select_related().filter(
-            user=request.user
-        )
-        income_values = IncomeSerializer(incomes, many=True).data
-        income_balances = (
-            IncomeTransaction.objects.filter(
-                asset__user=request.user,
-                income__user=request.user,
-                created_at__year=timezone.now().year,
-                created_at__month=timezone.now().month,
-            )
-            .values("income")
-            .annotate(balance=Sum("amount"))
-            .order_by("income")
-        )
-        for v in income_values:
-            v.update(
-                income_balances.filter(income=v["pk"])
-                .values("balance")
-                .first()
-                or {"balance": Decimal("0")}
-            )
+    def summary(self, user):
+        """
+        Build summary payload without cache.
+
+        Monthly sums are read from incrementally maintained
+        IncomeMonthlyTotal and ExpenseMonthlyTotal rollups,
+        so there is no scan over month transactions.
+        Rollups are fetched with one query per transaction type
+        and joined with categories by dict, number of queries
+        doesn't depend on categories count.
+        """
 
-        # calculate expense categories for a month
-        expenses = ExpenseCategory.objects.select_related().filter(
-            user=request.user
-        )
-        expense_values = ExpenseSerializer(expenses, many=True).data
-        expense_balances = (
-            ExpenseTransaction.objects.filter(
-                asset__user=request.user,
-                expense__user=request.user,
-                created_at__year=timezone.now().year,
-                created_at__month=timezone.now().month,
-            )
-            .values("expense")
-            .annotate(balance=Sum("amount"))
-            .order_by("expense")
+        now = timezone.localtime()
+        return {
+            "assets": self.asset_values(user),
+            "incomes": self.income_values(user, now),
+            "expenses": self.expense_values(user, now),
+        }
+
+    def asset_values(self, user):
+        assets = self.queryset.filter(user=user)
+        return list(AssetSerializer(assets, many=True).data)
+
+    @staticmethod
+    def income_values(user, now):
+        """
+        Incomes categories with summary for a month.
+        """
+
+        incomes = IncomeSource.objects.select_related().filter(user=user)
+        values = list(IncomeSerializer(incomes, many=True).data)
+        balances = dict(
+            IncomeMonthlyTotal.objects.filter(
+                user=user, year=now.year, month=now.month
+            ).values_list("income", "amount")
         )
-        for v in expense_values:
-            v.update(
-                expense_balances.filter(expense=v["pk"])
-                .values("balance")
-                .first()
-                or {"balance": Decimal("0")}
-            )
+        for v in values:
+            v["balance"] = balances.get(v["pk"], Decimal("0"))
+        return values
 
-        return Response(
-            {
-                "assets": AssetSerializer(assets, many=True).data,
-                "incomes": income_values,
-                "expenses": expense_values,
-            }
+    @staticmethod
+    def expense_values(user, now):
+        """
+        Expense categories with summary for a month.
+        """
+
+        expenses = ExpenseCategory.objects.select_related().filter(user=user)
+        values = list(ExpenseSerializer(expenses, many=True).data)
+        balances = dict(
+            ExpenseMonthlyTotal.objects.filter(
+                user=user, year=now.year, month=now.month
+            ).values_list("expense", "amount")
         )
+        for v in values:
+            v["balance"] = balances.get(v["pk"], Decimal("0"))
+        return values
+
+
+_dashboard_executor = None
+_dashboard_lock = threading.Lock()
 
 
-class BaseModelSet(viewsets.ModelViewSet, PaginationMixin):
+def dashboard_executor():
+    """
+    Thread pool of ConcurrentInformationSet, it's created
+        by the first request, so processes importing views
+        (bot, management commands) have no pool.
+    """
+
+    global _dashboard_executor
+    with _dashboard_lock:
+        if _dashboard_executor is None:
+            _dashboard_executor = ThreadPoolExecutor(
+                max_workers=settings.DASHBOARD_WORKERS,
+                thread_name_prefix="dashboard",
+            )
+    return _dashboard_executor
+
+
+def _close_old_connections(func, *args):
+    """
+    Run func in pool thread and release its DB connection
+        by CONN_MAX_AGE rules, like request handler does.
+    """
+
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+class ConcurrentInformationSet(InformationSet):
+    """
+    Summary account information, where assets, incomes
+        and expenses are read concurrently in bounded thread pool,
+        every worker thread uses own DB connection.
+
+    Latency is close to the slowest part instead of sum of them,
+        but parts are read in separate transactions,
+        so they might not be consistent snapshot.
+    """
+
+    def summary(self, user):
+        now = timezone.localtime()
+        executor = dashboard_executor()
+        futures = {
+            "assets": executor.submit(
+                _close_old_connections, self.asset_values, user
+            ),
+            "incomes": executor.submit(
+                _close_old_connections, self.income_values, user, now
+            ),
+            "expenses": executor.submit(
+                _close_old_connections, self.expense_values, user, now
+            ),
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+
+class BaseModelSet(ETagMixin, PaginationMixin, viewsets.ModelViewSet):
     model_class = None
     serializer_class = None
 
@@ -120,6 +264,76 @@ class BaseModelSet(viewsets.ModelViewSet, PaginationMixin):
             default_permissions.append(IsOwner(model=self.model_class))
         return default_permissions
 
+    def get_object(self):
+        """
+        Object has been loaded by IsOwner permission
+            into request identity map, so there is no second query.
+        """
+
+        loader = get_loader(self.request)
+        obj = loader.load(self.model_class, self.kwargs["pk"])
+        if obj is None:
+            raise NotFoundException()
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    @property
+    def sparse_fields(self):
+        """
+        Fields requested with "?fields=" param for read actions.
+        """
+
+        if self.action not in ("list", "retrieve"):
+            return None
+        fields, _ = request_fields(self.request)
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields is not None:
+            kwargs["fields"] = self.sparse_fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Select only columns of requested fields.
+        """
+
+        queryset = super().get_queryset()
+        if self.sparse_fields is not None:
+            queryset = queryset.select_related(None).only(
+                *model_field_names(self.get_serializer())
+            )
+        return queryset
+
+    def transactions_response(self, request, serializer_class, **lookups):
+        """
+        History of object transactions for detail actions:
+        - "?from=&to=" period bounds;
+        - page or "?cursor=" keyset page of flat rows;
+        - "?summary=month" returns per-month totals instead of rows.
+        """
+
+        model = serializer_class.Meta.model
+        queryset = model.objects.filter(**lookups, **request_period(request))
+
+        summary = request.query_params.get("summary")
+        if summary is not None:
+            if summary != "month":
+                raise BadRequestException()
+            return Response(monthly_summary(queryset))
+
+        serializer = FlatTransactionSerializer(
+            serializer_class,
+            *request_fields(request),
+            loader=get_loader(request),
+        )
+        page = self.paginate_queryset(
+            queryset.values(*serializer.values_fields("id", "created_at"))
+        )
+        if page is None:
+            raise NotFoundException()
+        return self.get_paginated_response(serializer.data(page))
+
     def create(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -133,26 +347,35 @@ class BaseModelSet(viewsets.ModelViewSet, PaginationMixin):
         )
 
     def list(self, request, *args, **kwargs):
-        queryset_object = self.queryset.filter(user=request.user.pk)
-        if not queryset_object:
-            raise NotFoundException()
-        page = self.paginate_queryset(self.queryset)
-        if page is None:
+        """
+        Paginate only current user's rows in stable order.
+
+        Page is LIMIT/OFFSET query over user's rows and COUNT(*)
+            uses user index, empty page means there are no objects,
+            so there is no extra emptiness query.
+        """
+
+        page = self.paginate_queryset(
+            self.get_queryset().filter(user=request.user.pk).order_by("pk")
+        )
+        if not page:
             raise NotFoundException()
 
-        serializer = self.serializer_class(page, many=True)
+        serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
 
 class BaseModelTransactionSet(
+    ETagMixin,
+    PaginationMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet,
-    PaginationMixin,
 ):
     permission_classes = [IsAuthenticated]
+    cursor_actions = ("list",)
 
     model_class = None
     serializer_class = None
@@ -162,6 +385,40 @@ class BaseModelTransactionSet(
     from_field, to_field = "", ""
     from_model, to_model = None, None
 
+    batch_max_size = 1000
+
+    def _load_owned(self, model, pks):
+        """
+        Fetch referenced objects through request identity map
+            with one pk__in query, all of them must belong to user.
+        """
+
+        objects = get_loader(self.request).load_many(model, pks)
+        for obj in objects.values():
+            if obj is None or obj.user_id != self.request.user.pk:
+                raise NotFoundException()
+        return objects
+
+    def get_object(self):
+        """
+        Transaction of current user with joined asset and category,
+            they are stored in request identity map too.
+        """
+
+        loader = get_loader(self.request)
+        obj = loader.load(
+            self.model_class, self.kwargs["pk"], queryset=self.queryset
+        )
+        if obj is None:
+            raise NotFoundException()
+
+        related = (getattr(obj, self.from_field), getattr(obj, self.to_field))
+        if any(item.user_id != self.request.user.pk for item in related):
+            raise NotFoundException()
+
+        loader.prime(*related)
+        return obj
+
     def create(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -172,108 +429,159 @@ class BaseModelTransactionSet(
         except:
             raise BadRequestException()
 
-        try:
-            from_qs = self.from_model.objects.get(
-                pk=from_id, user=request.user.pk
-            )
-            to_qs = self.to_model.objects.get(pk=to_id, user=request.user.pk)
-        except ObjectDoesNotExist:
-            raise NotFoundException()
+        from_obj = self._load_owned(self.from_model, [from_id])[from_id]
+        to_obj = self._load_owned(self.to_model, [to_id])[to_id]
 
         transaction = self.model_class(**serializer.data)
-        setattr(transaction, self.from_field, from_qs)
-        setattr(transaction, self.to_field, to_qs)
+        setattr(transaction, self.from_field, from_obj)
+        setattr(transaction, self.to_field, to_obj)
         transaction.save()
 
         return Response({"pk": transaction.pk}, status=status.HTTP_201_CREATED)
 
+    @action(methods=["post"], detail=False)
+    def batch(self, request):
+        """
+        Create list of transactions in one request:
+        - whole list is validated at first;
+        - referenced objects are fetched with one query per model;
+        - rows are inserted with bulk_create and every affected asset
+          gets one aggregated balance update, all in one DB transaction.
+        """
+
+        if not isinstance(request.data, list) or not (
+            0 < len(request.data) <= self.batch_max_size
+        ):
+            raise BadRequestException()
+
+        serializer = self.serializer_class(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            references = [
+                (item[self.from_field]["pk"], item[self.to_field]["pk"])
+                for item in request.data
+            ]
+        except:
+            raise BadRequestException()
+
+        from_objects = self._load_owned(
+            self.from_model, {from_id for from_id, _ in references}
+        )
+        to_objects = self._load_owned(
+            self.to_model, {to_id for _, to_id in references}
+        )
+
+        transactions = []
+        for values, (from_id, to_id) in zip(
+            serializer.validated_data, references
+        ):
+            from_obj, to_obj = from_objects[from_id], to_objects[to_id]
+            transaction = self.model_class(**values)
+            setattr(transaction, self.from_field, from_obj)
+            setattr(transaction, self.to_field, to_obj)
+            transactions.append(transaction)
+
+        self.model_class.bulk_save(transactions)
+
+        return Response(
+            {"count": len(transactions)}, status=status.HTTP_201_CREATED
+        )
+
     def list(self, request, *args, **kwargs):
         queryset_object = self.queryset.filter(
             **{f"{self.from_field}__user": request.user},
             **{f"{self.to_field}__user": request.user},
+            **request_period(request),
         )
-        if not queryset_object:
+        if not queryset_object.exists():
             raise NotFoundException()
 
-        page = self.paginate_queryset(queryset_object)
+        serializer = FlatTransactionSerializer(
+            self.serializer_class,
+            *request_fields(request),
+            loader=get_loader(request),
+        )
+        page = self.paginate_queryset(
+            queryset_object.values(
+                *serializer.values_fields("id", "created_at")
+            )
+        )
         if page is None:
             raise NotFoundException()
 
-        serializer = self.serializer_class(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(serializer.data(page))
 
     def retrieve(self, request, pk):
+        serializer = FlatTransactionSerializer(
+            self.serializer_class, *request_fields(request)
+        )
         try:
-            obj = self.queryset.get(
-                pk=pk,
-                **{f"{self.from_field}__user": request.user},
-                **{f"{self.to_field}__user": request.user},
-            )
-        except ObjectDoesNotExist:
-            raise NotFoundException()
-        return Response(self.serializer_class(obj).data)
-
-    def destroy(self, request, pk):
-        try:
-            obj = self.queryset.get(
+            row = self.queryset.values(*serializer.values_fields()).get(
                 pk=pk,
                 **{f"{self.from_field}__user": request.user},
                 **{f"{self.to_field}__user": request.user},
             )
         except ObjectDoesNotExist:
             raise NotFoundException()
-        return super().destroy(request, pk)
+        return Response(serializer.data([row])[0])
 
 
 class AssetSet(BaseModelSet):
     model_class = Asset
     serializer_class = AssetSerializer
+    cursor_actions = ("incoming", "outgoing")
+    etag_actions = ("list", "retrieve", "incoming", "outgoing")
 
     queryset = model_class.objects.select_related().all()
 
     @action(methods=["get"], detail=True)
     def incoming(self, request, pk):
-        incomes = IncomeTransaction.objects.select_related().filter(asset=pk)
-        page = self.paginate_queryset(incomes)
-        if page is None:
-            raise NotFoundException()
-        serializer = IncomeTransactionSerializer(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        return self.transactions_response(
+            request, IncomeTransactionSerializer, asset=pk
+        )
 
     @action(methods=["get"], detail=True)
     def outgoing(self, request, pk):
-        expenses = ExpenseTransaction.objects.select_related().filter(asset=pk)
-        page = self.paginate_queryset(expenses)
-        if page is None:
-            raise NotFoundException()
-        serializer = ExpenseTransactionSerializer(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        return self.transactions_response(
+            request, ExpenseTransactionSerializer, asset=pk
+        )
 
 
 class IncomeSet(BaseModelSet):
     model_class = IncomeSource
     serializer_class = IncomeSerializer
+    cursor_actions = ("outgoing",)
+    etag_actions = ("list", "retrieve", "outgoing")
 
     queryset = model_class.objects.select_related().all()
 
     @action(methods=["get"], detail=True)
     def outgoing(self, request, pk):
-        incomes = IncomeTransaction.objects.select_related().filter(income=pk)
-        return Response(IncomeTransactionSerializer(incomes, many=True).data)
+        return self.transactions_response(
+            request,
+            IncomeTransactionSerializer,
+            income=pk,
+            asset__user=request.user.pk,
+        )
 
 
 class ExpenseSet(BaseModelSet):
     model_class = ExpenseCategory
     serializer_class = ExpenseSerializer
+    cursor_actions = ("incoming",)
+    etag_actions = ("list", "retrieve", "incoming")
 
     queryset = model_class.objects.select_related().all()
 
     @action(methods=["get"], detail=True)
     def incoming(self, request, pk):
-        expenses = ExpenseTransaction.objects.select_related().filter(
-            expense=pk
+        return self.transactions_response(
+            request,
+            ExpenseTransactionSerializer,
+            expense=pk,
+            asset__user=request.user.pk,
         )
-        return Response(ExpenseTransactionSerializer(expenses, many=True).data)
 
 
 class IncomeTransactionSet(BaseModelTransactionSet):
@@ -294,3 +602,146 @@ class ExpenseTransactionSet(BaseModelTransactionSet):
 
     from_field, to_field = "asset", "expense"
     from_model, to_model = Asset, ExpenseCategory
+
+
+class ExportSet(viewsets.ViewSet):
+    """
+    Streaming export of user's transactions history:
+    - "?output=ndjson" (default) or "?output=csv";
+    - "?type=income" or "?type=expense", by default both;
+    - "?from=&to=" period bounds.
+
+    Under daphne the path is served by api.consumers.ExportConsumer,
+        which streams the same lines without blocking event loop,
+        this view serves WSGI and test clients.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    chunk_size = 2000
+
+    def list(self, request):
+        try:
+            content_type, output, lines = export_lines(
+                request.user, request.query_params, self.chunk_size
+            )
+        except ValueError:
+            raise BadRequestException()
+
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="transactions.{output}"'
+        return response
+
+
+class SearchSet(viewsets.ViewSet):
+    """
+    Full-text search over transactions tags, category
+        and asset descriptions, "?q=" words are prefix terms:
+        "?q=phar" finds "pharmacy".
+    Results are ordered by relevance and paginated by "?page=".
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    page_size = api_settings.PAGE_SIZE
+    query_max_length = 256
+
+    def list(self, request):
+        query = request.query_params.get("q", "")
+        try:
+            page = int(request.query_params.get("page", 1))
+        except ValueError:
+            raise BadRequestException()
+        if not query.strip() or len(query) > self.query_max_length:
+            raise BadRequestException()
+        if page < 1:
+            raise BadRequestException()
+
+        results = search_transactions(
+            request.user.pk,
+            query,
+            limit=self.page_size + 1,
+            offset=(page - 1) * self.page_size,
+        )
+        # same "x.0000" strings as transaction serializers
+        amount = ExpenseTransactionSerializer().fields["amount"]
+        for row in results:
+            row["amount"] = amount.to_representation(row["amount"])
+
+        next_link = None
+        if len(results) > self.page_size:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), "page", page + 1
+            )
+
+        return Response(
+            {"next": next_link, "results": results[: self.page_size]}
+        )
+
+
+class TagSet(viewsets.ViewSet):
+    """
+    Expense totals per tag for "?from=&to=" period,
+        current month by default, computed with one grouped query
+        over normalized tag links.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        rows = (
+            ExpenseTransactionTag.objects.filter(
+                tag__user=request.user.pk,
+                **request_period(
+                    request,
+                    field="transaction__created_at",
+                    default=month_bounds(),
+                ),
+            )
+            .values("tag__name")
+            .annotate(
+                amount=Sum("transaction__amount"), count=Count("transaction")
+            )
+            .order_by("-amount", "tag__name")
+        )
+        return Response(
+            [
+                {
+                    "name": row["tag__name"],
+                    "amount": row["amount"],
+                    "count": row["count"],
+                }
+                for row in rows
+            ]
+        )
+
+
+class BatchSet(viewsets.ViewSet):
+    """
+    Multiplexed API requests in one round trip:
+        POST [{"method": "GET", "url": "/api/assets/1/incoming/"}, ...]
+        returns [{"status", "headers", "body"}, ...] in the same order.
+
+    Session, user and request identity map are resolved once
+        and shared by sub-requests, which are dispatched in order
+        to /api/ views without middleware.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    batch_max_size = 20
+
+    def create(self, request):
+        if not isinstance(request.data, list) or not (
+            0 < len(request.data) <= self.batch_max_size
+        ):
+            raise BadRequestException()
+
+        return Response(
+            [
+                dispatch(request, item, forbidden_views=(BatchSet,))
+                for item in request.data
+            ]
+        )
@@ -1,7 +1,6 @@
 from abc import ABCMeta, abstractmethod
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from django.utils import timezone
 
 from bot.decorators import username_extension, logger
 from main.models import (
@@ -11,6 +10,7 @@ from main.models import (
     Asset,
     ExpenseCategory,
 )
+from main.utils import month_bounds, period_filter
 
 
 TRANSACTION_NAMES = ("incoming", "outgoing")
@@ -167,8 +167,7 @@ class TransactionHandler(metaclass=ABCMeta):
                     f"- {record} "
                     for record in cls.MODEL.objects.filter(
                         asset__user=username,
-                        created_at__year=timezone.now().year,
-                        created_at__month=timezone.now().month,
+                        **period_filter(*month_bounds()),
                     ).order_by("created_at")
                 ]
             )
@@ -185,9 +184,7 @@ class TransactionHandler(metaclass=ABCMeta):
 
         markup = InlineKeyboardMarkup([])
         for record in cls.MODEL.objects.filter(
-            asset__user=username,
-            created_at__year=timezone.now().year,
-            created_at__month=timezone.now().month,
+            asset__user=username, **period_filter(*month_bounds())
         ).order_by("created_at"):
             markup.inline_keyboard.append(
                 [
@@ -24,6 +24,8 @@ from bot.handlers.callbacks import (
 )
 from bot.handlers.commands import DefaultCommandsHandler
 from bot.handlers.messages import DefaultMessagesHandler
+from main.sampler import start_sampler
+from main.slowlog import install_slow_query_log
 
 
 class Command(BaseCommand):
@@ -90,6 +92,9 @@ class Command(BaseCommand):
         #     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         # )
 
+        start_sampler("bot")
+        install_slow_query_log()
+
         updater = Updater(token=settings.BOT_TOKEN, use_context=True,)
         dispatcher = updater.dispatcher
 
@@ -8,9 +8,41 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
 
 import os
+from functools import partial
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "finance.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imports use models, so they go after Django setup
+from channels.auth import AuthMiddlewareStack
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+from django.urls import path, re_path
+
+from api.consumers import ExportConsumer
+from api.routing import websocket_urlpatterns
+from main.sampler import start_sampler
+from main.slowlog import install_slow_query_log
+
+start_sampler("web")
+install_slow_query_log()
+
+application = ProtocolTypeRouter(
+    {
+        "http": URLRouter(
+            [
+                # streaming export doesn't block event loop
+                path("api/export/", AuthMiddlewareStack(ExportConsumer)),
+                # Django handler is ASGI 3 single callable,
+                # channels 2 router expects ASGI 2 application instance
+                re_path(r"", lambda scope: partial(django_application, scope)),
+            ]
+        ),
+        "websocket": AllowedHostsOriginValidator(
+            AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        ),
+    }
+)
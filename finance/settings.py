@@ -40,11 +40,19 @@ DATABASE_PATH = os.environ.get("DATABASE_PATH") or os.path.join(
     BASE_DIR, "db.sqlite3"
 )
 
+# Cache directory, shared by web and bot processes
+CACHE_PATH = os.environ.get("CACHE_PATH") or os.path.join(BASE_DIR, "cache")
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
 ALLOWED_HOSTS = ["*"]
 
+# nginx terminates TLS and sets X-Forwarded-Proto (confs/nginx),
+# daphne listens only on its unix socket, so the header is trusted:
+# absolute links (pagination "next") keep https scheme
+SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+
 
 # Application definition
 
@@ -72,11 +80,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "main.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "main.middleware.PermissionsMiddleware",
@@ -111,6 +121,80 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# file based backend because bot process invalidates web cache
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_PATH,
+    }
+}
+
+# Channel layer of balances push (api.consumers), in memory layer
+# works only inside one process, so bot changes are delivered
+# with redis layer (channels_redis package) only, it's the layer
+# of deployment (see confs/systemd)
+
+CHANNEL_REDIS_URL = os.environ.get("CHANNEL_REDIS_URL")
+CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    if not CHANNEL_REDIS_URL
+    else {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [CHANNEL_REDIS_URL]},
+    }
+}
+
+# summary information (/api/common-info/) cache lifetime, in seconds
+DASHBOARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# thread pool size of /api/common-info-async/ concurrent reads
+DASHBOARD_WORKERS = int(os.environ.get("DASHBOARD_WORKERS", 3))
+
+
+# Prometheus metrics of requests (main.metrics), allowed without
+# session only for local scrapes or with "Authorization: Bearer"
+# METRICS_TOKEN header (daphne on unix socket, see confs/nginx)
+
+METRICS_PATH = "/metrics"
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+
+# Per-request cProfile capture (main.middleware.ProfilingMiddleware)
+# of staff users and sampled share of requests, only PROFILE_MAX_FILES
+# latest dumps are kept in PROFILE_PATH
+
+PROFILE_PATH = os.environ.get("PROFILE_PATH") or os.path.join(
+    BASE_DIR, "profiles"
+)
+PROFILE_STAFF = os.environ.get("PROFILE_STAFF", "") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 500))
+
+
+# Always-on stack sampler (main.sampler) of daphne and bot processes:
+# stacks of all threads are taken every SAMPLER_INTERVAL seconds
+# (0 disables it) and written as collapsed stacks to SAMPLER_PATH
+# every SAMPLER_FLUSH_INTERVAL seconds
+
+SAMPLER_INTERVAL = float(os.environ.get("SAMPLER_INTERVAL", 0))
+SAMPLER_PATH = os.environ.get("SAMPLER_PATH") or os.path.join(
+    BASE_DIR, "samples"
+)
+SAMPLER_FLUSH_INTERVAL = int(os.environ.get("SAMPLER_FLUSH_INTERVAL", 60))
+SAMPLER_MAX_FILES = int(os.environ.get("SAMPLER_MAX_FILES", 1000))
+
+
+# SQL statements slower than SLOW_QUERY_THRESHOLD seconds (0 disables)
+# are logged by "main.slowlog" logger of daphne and bot processes
+# with query plan and project call site
+
+SLOW_QUERY_THRESHOLD = float(os.environ.get("SLOW_QUERY_THRESHOLD", 0))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -193,6 +277,16 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        "main.sampler": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "main.slowlog": {
+            "handlers": ["console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
     },
 }
 
@@ -18,12 +18,15 @@ Including another URLconf
 from django.conf import settings
 from django.urls import path, include
 
+from main.views import metrics
+
 urlpatterns = [
     # path("admin/", admin.site.urls),
     path("api/", include("api.urls", namespace="api")),
     path("bot/", include("bot.urls", namespace="bot")),
     path("rest-auth/", include("rest_auth.urls")),
     path("rest-auth/registration/", include("rest_auth.registration.urls")),
+    path(settings.METRICS_PATH.lstrip("/"), metrics, name="metrics"),
 ]
 
 if settings.DEBUG:
@@ -24,6 +24,10 @@ export default {
     switch (name) {
       case "commonInfo":
         return "/api/common-info/";
+      case "balancesSocket": {
+        const scheme = window.location.protocol === "https:" ? "wss" : "ws";
+        return `${scheme}://${window.location.host}/api/ws/balances/`;
+      }
 
       case "createAsset":
         return "/api/assets/";
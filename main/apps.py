@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class MainappConfig(AppConfig):
     name = "main"
+
+    def ready(self):
+        # connect cache invalidation receivers
+        import main.signals
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+def dashboard_key(user_id):
+    """
+    Cache key contains current month,
+        so payload expires with calendar month change.
+    """
+
+    now = timezone.localtime()
+    return f"dashboard:{user_id}:{now.year}-{now.month:02}"
+
+
+def get_dashboard(user_id):
+    return cache.get(dashboard_key(user_id))
+
+
+def set_dashboard(user_id, payload):
+    cache.set(
+        dashboard_key(user_id), payload, settings.DASHBOARD_CACHE_TIMEOUT
+    )
+
+
+def invalidate_dashboard(user_id):
+    """
+    Remove cached payload right now and once again after commit:
+        concurrent request might cache old data
+        before current DB transaction has committed.
+    """
+
+    key = dashboard_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,118 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from main.models import Asset, IncomeSource, IncomeTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark parallel writers on one asset: "
+        + "throughput and final balance correctness"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--operations", type=int, default=100)
+        parser.add_argument("--amount", type=str, default="1.25")
+        parser.add_argument(
+            "--mode",
+            choices=("sql", "python"),
+            default="sql",
+            help="sql — IncomeTransaction.save() with SQL-side delta, "
+            + "python — legacy read-modify-write of Asset row",
+        )
+
+    @staticmethod
+    def _python_write(asset_pk, income, amount):
+        """
+        Legacy balance update, kept only as a reference point:
+            read balance into Python, add amount and save whole row.
+        """
+
+        with transaction.atomic():
+            asset = Asset.objects.get(pk=asset_pk)
+            asset.balance += amount
+            asset.save()
+            IncomeTransaction.objects.bulk_create(
+                [IncomeTransaction(asset=asset, income=income, amount=amount)]
+            )
+
+    @staticmethod
+    def _sql_write(asset_pk, income, amount):
+        IncomeTransaction(
+            asset_id=asset_pk, income=income, amount=amount
+        ).save()
+
+    def _writer(self, write, asset_pk, income, amount, operations, result):
+        try:
+            for _ in range(operations):
+                try:
+                    write(asset_pk, income, amount)
+                    result["ok"] += 1
+                except Exception as err:
+                    result["errors"] += 1
+                    result["last_error"] = f"{err}"
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        writers, operations = options["writers"], options["operations"]
+        amount = Decimal(options["amount"])
+        write = (
+            self._sql_write if options["mode"] == "sql" else self._python_write
+        )
+
+        user, _ = get_user_model().objects.get_or_create(username="benchmark")
+        asset = Asset.objects.create(user=user, description="benchmark")
+        income = IncomeSource.objects.create(user=user, description="benchmark")
+        try:
+            results = [
+                {"ok": 0, "errors": 0, "last_error": None}
+                for _ in range(writers)
+            ]
+            threads = [
+                threading.Thread(
+                    target=self._writer,
+                    args=(write, asset.pk, income, amount, operations, result),
+                )
+                for result in results
+            ]
+
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            succeeded = sum(result["ok"] for result in results)
+            errors = sum(result["errors"] for result in results)
+            asset.refresh_from_db(fields=["balance"])
+            expected = amount * succeeded
+
+            self.stdout.write(
+                f"mode: {options['mode']}, writers: {writers}, "
+                + f"operations per writer: {operations}"
+            )
+            self.stdout.write(
+                f"elapsed: {elapsed:.3f}s, "
+                + f"throughput: {succeeded / elapsed:.1f} writes/s, "
+                + f"errors: {errors}"
+            )
+            for result in results:
+                if result["last_error"]:
+                    self.stdout.write(f"last error: {result['last_error']}")
+                    break
+            self.stdout.write(
+                f"balance: {asset.balance}, expected: {expected}, "
+                + f"lost: {expected - asset.balance}"
+            )
+        finally:
+            # transactions and monthly totals are removed by cascade
+            asset.delete()
+            income.delete()
@@ -0,0 +1,76 @@
+import io
+import pstats
+import statistics
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from main.profiling import load_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "List the slowest requests captured by ProfilingMiddleware "
+        + "and summarize captures per view"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--path", help="captures of path prefix only")
+        parser.add_argument(
+            "--functions",
+            type=int,
+            default=0,
+            help="print N top functions by cumulative time of every capture",
+        )
+
+    def _summary(self, profiles):
+        durations = defaultdict(list)
+        for item in profiles:
+            durations[item["view"]].append(item["duration"] * 1000)
+
+        self.stdout.write(
+            f"{'view':<40} {'count':>6} {'median':>10} {'max':>10}"
+        )
+        for view, values in sorted(
+            durations.items(), key=lambda item: -max(item[1])
+        ):
+            self.stdout.write(
+                f"{view:<40} {len(values):>6} "
+                + f"{statistics.median(values):>8.1f}ms "
+                + f"{max(values):>8.1f}ms"
+            )
+
+    def _functions(self, item, limit):
+        output = io.StringIO()
+        try:
+            stats = pstats.Stats(item["profile"], stream=output)
+        except OSError:
+            # capture rotated out between listing and reading
+            return
+        stats.sort_stats("cumulative").print_stats(limit)
+        self.stdout.write(output.getvalue())
+
+    def handle(self, *args, **options):
+        profiles = [
+            item
+            for item in load_profiles()
+            if not options["path"] or item["path"].startswith(options["path"])
+        ]
+        if not profiles:
+            self.stdout.write("There are no captured profiles")
+            return
+
+        self._summary(profiles)
+        self.stdout.write("")
+
+        slowest = sorted(profiles, key=lambda item: -item["duration"])
+        for item in slowest[: options["limit"]]:
+            self.stdout.write(
+                f"{item['duration'] * 1000:>8.1f}ms {item['status']} "
+                + f"{item['method']} {item['path']} ({item['view']}, "
+                + f"{item['reason']}, {item['created_at']}) "
+                + f"{item['profile']}"
+            )
+            if options["functions"]:
+                self._functions(item, options["functions"])
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from main.models import (
+    IncomeMonthlyTotal,
+    ExpenseMonthlyTotal,
+    IncomeTransaction,
+    ExpenseTransaction,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild monthly income and expense totals from transactions"
+
+    @staticmethod
+    def _rebuild(rollup_model, transaction_model):
+        """
+        Remove rollup rows and create them again
+            from grouped transactions.
+        """
+
+        category = rollup_model.CATEGORY_FIELD
+        rows = (
+            transaction_model.objects.annotate(
+                year=ExtractYear("created_at"),
+                month=ExtractMonth("created_at"),
+            )
+            .values(category, f"{category}__user", "year", "month")
+            .annotate(total=Sum("amount"))
+            .order_by()
+        )
+
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create(
+            rollup_model(
+                user_id=row[f"{category}__user"],
+                year=row["year"],
+                month=row["month"],
+                amount=row["total"],
+                **{f"{category}_id": row[category]},
+            )
+            for row in rows.iterator()
+        )
+        return rollup_model.objects.count()
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            incomes = self._rebuild(IncomeMonthlyTotal, IncomeTransaction)
+            expenses = self._rebuild(ExpenseMonthlyTotal, ExpenseTransaction)
+
+        self.stdout.write(
+            f"Rebuilt {incomes} income and {expenses} expense monthly totals"
+        )
@@ -0,0 +1,286 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from bot.models import TelegramUser
+from main.models import (
+    Asset,
+    IncomeSource,
+    ExpenseCategory,
+    IncomeTransaction,
+    ExpenseTransaction,
+)
+
+
+ASSET_NAMES = (
+    ("Cash", Asset.CASH),
+    ("Salary card", Asset.BANK_CARD),
+    ("Savings card", Asset.BANK_CARD),
+    ("Credit card", Asset.CREDIT_CARD),
+    ("Travel card", Asset.BANK_CARD),
+)
+INCOME_NAMES = ("Salary", "Freelance", "Cashback", "Dividends", "Gifts")
+EXPENSE_NAMES = (
+    "Groceries",
+    "Rent",
+    "Transport",
+    "Restaurants",
+    "Utilities",
+    "Health",
+    "Clothes",
+    "Entertainment",
+    "Travel",
+    "Education",
+    "Sport",
+    "Pets",
+)
+TAG_NAMES = (
+    "family",
+    "work",
+    "weekend",
+    "vacation",
+    "online",
+    "subscription",
+    "gift",
+    "kids",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic users with assets, categories "
+        + "and multi-year income and expense histories"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="usernames are <prefix>-<number>, "
+            + "telegram usernames are <prefix>_<number>",
+        )
+        parser.add_argument(
+            "--password",
+            default=None,
+            help="password of seeded users, unusable by default",
+        )
+        parser.add_argument("--assets", type=int, default=3)
+        parser.add_argument("--incomes", type=int, default=2)
+        parser.add_argument("--categories", type=int, default=8)
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument(
+            "--incomes-per-month",
+            type=int,
+            default=3,
+            help="income transactions per user and month",
+        )
+        parser.add_argument(
+            "--expenses-per-month",
+            type=int,
+            default=60,
+            help="expense transactions per user and month",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="random generator seed"
+        )
+
+    @staticmethod
+    def _names(names, count):
+        """
+        First count names, repeated with number suffix if needed.
+        """
+
+        return [
+            names[i % len(names)]
+            + (f" {i // len(names) + 1}" if i >= len(names) else "")
+            for i in range(count)
+        ]
+
+    @staticmethod
+    def _moments(rnd, now, years, per_month):
+        """
+        Random datetimes, per_month for every month
+            of last years, the latest month ends at now.
+        """
+
+        year, month = now.year - years, now.month
+        moments = []
+        while (year, month) <= (now.year, now.month):
+            start = now.replace(
+                year=year,
+                month=month,
+                day=1,
+                hour=0,
+                minute=0,
+                second=0,
+                microsecond=0,
+            )
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            end = min(now, start.replace(year=year, month=month))
+            seconds = int((end - start).total_seconds())
+            moments += [
+                start + timedelta(seconds=rnd.randrange(max(seconds, 1)))
+                for _ in range(per_month)
+            ]
+        return sorted(moments)
+
+    def _create_users(self, options):
+        usernames = [
+            f"{options['prefix']}-{i}" for i in range(options["users"])
+        ]
+        model = get_user_model()
+        if model.objects.filter(username__in=usernames).exists():
+            raise CommandError(
+                f"Users with prefix {options['prefix']} already exist"
+            )
+
+        password = make_password(options["password"])
+        model.objects.bulk_create(
+            (model(username=name, password=password) for name in usernames),
+            batch_size=400,
+        )
+        # SQLite backend doesn't return primary keys from bulk_create
+        users = list(
+            model.objects.filter(username__in=usernames).order_by("pk")
+        )
+        TelegramUser.objects.bulk_create(
+            (
+                TelegramUser(
+                    tg_username=f"{options['prefix']}_{i}",
+                    user=user,
+                    is_active=True,
+                )
+                for i, user in enumerate(users)
+            ),
+            batch_size=400,
+        )
+        return users
+
+    @staticmethod
+    def _create_objects(model, users, rows):
+        """
+        Create objects of every row fields for every user,
+            return {user id: [objects]}.
+        """
+
+        model.objects.bulk_create(
+            (model(user=user, **row) for user in users for row in rows),
+            batch_size=400,
+        )
+        objects = {}
+        for item in model.objects.filter(user__in=users).order_by("pk"):
+            objects.setdefault(item.user_id, []).append(item)
+        return objects
+
+    @staticmethod
+    def _save_history(model, transactions, moments):
+        """
+        Insert transactions through bulk_save (balances, tags,
+            search index), then move them to generated dates,
+            created_at is auto_now_add and can't be set on insert.
+        """
+
+        transactions = model.bulk_save(transactions)
+        for item, moment in zip(transactions, moments):
+            item.created_at = moment
+        model.objects.bulk_update(transactions, ["created_at"])
+        return len(transactions)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        now = timezone.now()
+        totals = {"incomes": 0, "expenses": 0}
+
+        with transaction.atomic():
+            users = self._create_users(options)
+            assets = self._create_objects(
+                Asset,
+                users,
+                [
+                    {
+                        "description": name,
+                        "type": ASSET_NAMES[i % len(ASSET_NAMES)][1],
+                    }
+                    for i, name in enumerate(
+                        self._names(
+                            [name for name, _ in ASSET_NAMES],
+                            options["assets"],
+                        )
+                    )
+                ],
+            )
+            incomes = self._create_objects(
+                IncomeSource,
+                users,
+                [
+                    {"description": name}
+                    for name in self._names(INCOME_NAMES, options["incomes"])
+                ],
+            )
+            categories = self._create_objects(
+                ExpenseCategory,
+                users,
+                [
+                    {
+                        "description": name,
+                        "monthly_limit": float(rnd.randrange(100, 2000, 50)),
+                    }
+                    for name in self._names(
+                        EXPENSE_NAMES, options["categories"]
+                    )
+                ],
+            )
+
+            for user in users:
+                moments = self._moments(
+                    rnd, now, options["years"], options["incomes_per_month"]
+                )
+                totals["incomes"] += self._save_history(
+                    IncomeTransaction,
+                    [
+                        IncomeTransaction(
+                            asset=rnd.choice(assets[user.pk]),
+                            income=rnd.choice(incomes[user.pk]),
+                            amount=Decimal(rnd.randrange(50000, 500000))
+                            / 100,
+                        )
+                        for _ in moments
+                    ],
+                    moments,
+                )
+
+                moments = self._moments(
+                    rnd, now, options["years"], options["expenses_per_month"]
+                )
+                totals["expenses"] += self._save_history(
+                    ExpenseTransaction,
+                    [
+                        ExpenseTransaction(
+                            asset=rnd.choice(assets[user.pk]),
+                            expense=rnd.choice(categories[user.pk]),
+                            amount=Decimal(rnd.randrange(100, 20000)) / 100,
+                            tags=", ".join(
+                                rnd.sample(TAG_NAMES, rnd.randrange(3))
+                            ),
+                        )
+                        for _ in moments
+                    ],
+                    moments,
+                )
+
+            # bulk_save has put all amounts into current month totals
+            call_command("rebuild_monthly_totals", stdout=self.stdout)
+
+        self.stdout.write(
+            f"Seeded {len(users)} users, "
+            + f"{totals['incomes']} income and "
+            + f"{totals['expenses']} expense transactions"
+        )
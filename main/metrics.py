@@ -0,0 +1,142 @@
+import threading
+import time
+from bisect import bisect_left
+
+
+class Histogram:
+    """
+    Cumulative histogram of Prometheus text format,
+        values are stored per label values in process memory.
+    """
+
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counters, sum, count
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @staticmethod
+    def _escape(value):
+        for char, escaped in (("\\", "\\\\"), ("\n", "\\n"), ('"', '\\"')):
+            value = value.replace(char, escaped)
+        return value
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return (
+            "{"
+            + ",".join(
+                f'{name}="{self._escape(value)}"' for name, value in pairs
+            )
+            + "}"
+        )
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {
+                key: (list(buckets), total, count)
+                for key, (buckets, total, count) in self._series.items()
+            }
+
+        for key, (buckets, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, value in zip(self.buckets, buckets):
+                cumulative += value
+                labels = self._labels(key, [("le", repr(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = self._labels(key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class QueryStats:
+    """
+    connection.execute_wrapper, which counts queries and SQL time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+SECONDS_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+QUERIES_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUEST_DURATION = Histogram(
+    "finance_request_duration_seconds",
+    "Wall time of HTTP request handling.",
+    SECONDS_BUCKETS,
+    ("view", "method"),
+)
+REQUEST_QUERIES = Histogram(
+    "finance_request_queries",
+    "Number of SQL queries per HTTP request.",
+    QUERIES_BUCKETS,
+    ("view", "method"),
+)
+REQUEST_SQL_DURATION = Histogram(
+    "finance_request_sql_seconds",
+    "Total SQL time per HTTP request.",
+    SECONDS_BUCKETS,
+    ("view", "method"),
+)
+
+REGISTRY = (REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SQL_DURATION)
+
+
+def observe_request(view, method, duration, queries):
+    REQUEST_DURATION.observe(duration, view=view, method=method)
+    REQUEST_QUERIES.observe(queries.count, view=view, method=method)
+    REQUEST_SQL_DURATION.observe(queries.duration, view=view, method=method)
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
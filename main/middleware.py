@@ -1,5 +1,117 @@
+import cProfile
+import random
+import sys
+import time
+
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connection
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from main.metrics import QueryStats, observe_request
+from main.profiling import save_profile
+
+
+def is_metrics_scrape(request):
+    """
+    Metrics are available without session only for local scrapes
+        or with METRICS_TOKEN bearer token: daphne behind nginx
+        listens on unix socket, so there is no client address.
+    """
+
+    if request.path != settings.METRICS_PATH:
+        return False
+    if request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS:
+        return True
+    return bool(settings.METRICS_TOKEN) and constant_time_compare(
+        request.META.get("HTTP_AUTHORIZATION", ""),
+        f"Bearer {settings.METRICS_TOKEN}",
+    )
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, SQL queries count and SQL time of every request
+        per resolved view into main.metrics histograms.
+
+    Queries are counted on connection of request thread,
+        so reads of helper threads are not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        observe_request(
+            match.view_name if match else "<unresolved>",
+            request.method,
+            duration,
+            queries,
+        )
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Wrap request handling in cProfile for staff users (PROFILE_STAFF)
+        and PROFILE_SAMPLE_RATE share of other requests,
+        dumps are stored by main.profiling, see "profiles" command.
+
+    Middleware is disabled when nothing is profiled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_STAFF and settings.PROFILE_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    @staticmethod
+    def _reason(request):
+        if settings.PROFILE_STAFF and request.user.is_staff:
+            return "staff"
+        if random.random() < settings.PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    def __call__(self, request):
+        reason = self._reason(request)
+        # another profiler (debug toolbar) owns the thread
+        if reason is None or sys.getprofile() is not None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        save_profile(
+            profiler,
+            {
+                "created_at": timezone.now().isoformat(),
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else "<unresolved>",
+                "status": response.status_code,
+                "duration": duration,
+                "user": request.user.pk,
+                "reason": reason,
+            },
+        )
+        return response
 
 
 class PermissionsMiddleware:
@@ -12,9 +124,11 @@ class PermissionsMiddleware:
         class validate user instance and check URI path.
         """
 
-        if isinstance(
-            request.user, AnonymousUser
-        ) and not request.path.startswith("/rest-auth/"):
+        if (
+            isinstance(request.user, AnonymousUser)
+            and not request.path.startswith("/rest-auth/")
+            and not is_metrics_scrape(request)
+        ):
             raise PermissionDenied()
 
         response = self.get_response(request)
@@ -0,0 +1,84 @@
+# Generated by Django 3.0.4 on 2026-10-18 19:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_monthly_totals(apps, schema_editor):
+    for rollup, source, category in (
+        ("IncomeMonthlyTotal", "IncomeTransaction", "income"),
+        ("ExpenseMonthlyTotal", "ExpenseTransaction", "expense"),
+    ):
+        rollup_model = apps.get_model("main", rollup)
+        rows = (
+            apps.get_model("main", source)
+            .objects.annotate(
+                year=ExtractYear("created_at"), month=ExtractMonth("created_at")
+            )
+            .values(category, f"{category}__user", "year", "month")
+            .annotate(total=Sum("amount"))
+            .order_by()
+        )
+        rollup_model.objects.bulk_create(
+            rollup_model(
+                user_id=row[f"{category}__user"],
+                year=row["year"],
+                month=row["month"],
+                amount=row["total"],
+                **{f"{category}_id": row[category]},
+            )
+            for row in rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0006_auto_20200116_1112'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncomeMonthlyTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Calendar year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Calendar month')),
+                ('amount', models.DecimalField(decimal_places=4, default=0, max_digits=19, verbose_name='Monthly transactions amount')),
+                ('income', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.IncomeSource')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExpenseMonthlyTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Calendar year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Calendar month')),
+                ('amount', models.DecimalField(decimal_places=4, default=0, max_digits=19, verbose_name='Monthly transactions amount')),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.ExpenseCategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='incomemonthlytotal',
+            index=models.Index(fields=['user', 'year', 'month'], name='main_income_user_id_699607_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='incomemonthlytotal',
+            unique_together={('income', 'year', 'month')},
+        ),
+        migrations.AddIndex(
+            model_name='expensemonthlytotal',
+            index=models.Index(fields=['user', 'year', 'month'], name='main_expens_user_id_a40ff1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expensemonthlytotal',
+            unique_together={('expense', 'year', 'month')},
+        ),
+        migrations.RunPython(fill_monthly_totals, migrations.RunPython.noop),
+    ]
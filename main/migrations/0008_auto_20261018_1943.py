@@ -0,0 +1,29 @@
+# Generated by Django 3.0.4 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_auto_20261018_1941'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expensetransaction',
+            index=models.Index(fields=['asset', 'created_at'], name='main_expens_asset_i_0c5417_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensetransaction',
+            index=models.Index(fields=['expense', 'created_at'], name='main_expens_expense_1c07d4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incometransaction',
+            index=models.Index(fields=['asset', 'created_at'], name='main_income_asset_i_297147_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incometransaction',
+            index=models.Index(fields=['income', 'created_at'], name='main_income_income__afabb8_idx'),
+        ),
+    ]
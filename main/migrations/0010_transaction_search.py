@@ -0,0 +1,150 @@
+# Generated by Django 3.0.4 on 2026-10-18 20:05
+
+from django.db import migrations
+
+
+# Full-text index of transactions (main.search), rowid is
+# transaction id * 2 for incomes and id * 2 + 1 for expenses.
+# Index is maintained by triggers, so bulk_create, queryset
+# updates and cascade deletes are covered too.
+
+# kind, transaction table, category table, category column, rowid shift
+SOURCES = (
+    (
+        "income",
+        "main_incometransaction",
+        "main_incomesource",
+        "income_id",
+        0,
+    ),
+    (
+        "expense",
+        "main_expensetransaction",
+        "main_expensecategory",
+        "expense_id",
+        1,
+    ),
+)
+
+
+def insert_sql(kind, category_table, column, shift, row, source=""):
+    """
+    Index transaction "row": trigger row (new) or table alias,
+        "source" is additional FROM item for backfill.
+    """
+
+    tags = f"{row}.tags" if kind == "expense" else "''"
+    return f"""
+        INSERT INTO main_transactionsearch(
+            rowid, tags, category, asset, owner, kind, transaction_id
+        )
+        SELECT {row}.id * 2 + {shift}, {tags}, c.description,
+            a.description, 'user' || a.user_id, '{kind}', {row}.id
+        FROM {source}{category_table} c, main_asset a
+        WHERE c.id = {row}.{column} AND a.id = {row}.asset_id;
+    """
+
+
+def forward_sql():
+    statements = [
+        """
+        CREATE VIRTUAL TABLE main_transactionsearch USING fts5(
+            tags,
+            category,
+            asset,
+            owner,
+            kind UNINDEXED,
+            transaction_id UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        """
+    ]
+
+    for kind, table, category_table, column, shift in SOURCES:
+        columns = ["asset_id", column]
+        if kind == "expense":
+            columns.append("tags")
+        changed = " OR ".join(
+            f"old.{name} IS NOT new.{name}" for name in columns
+        )
+        delete = (
+            "DELETE FROM main_transactionsearch "
+            + f"WHERE rowid = old.id * 2 + {shift};"
+        )
+        insert = insert_sql(kind, category_table, column, shift, "new")
+        statements += [
+            f"""
+            CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table}
+            BEGIN {insert} END;
+            """,
+            f"""
+            CREATE TRIGGER {table}_search_update
+            AFTER UPDATE OF {", ".join(columns)} ON {table}
+            WHEN {changed}
+            BEGIN {delete} {insert} END;
+            """,
+            f"""
+            CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table}
+            BEGIN {delete} END;
+            """,
+            # backfill of existing rows
+            insert_sql(
+                kind, category_table, column, shift, "t", f"{table} t, "
+            ),
+            f"""
+            CREATE TRIGGER {category_table}_search_update
+            AFTER UPDATE OF description ON {category_table}
+            WHEN old.description <> new.description
+            BEGIN
+                UPDATE main_transactionsearch SET category = new.description
+                WHERE rowid IN (
+                    SELECT id * 2 + {shift} FROM {table}
+                    WHERE {column} = new.id
+                );
+            END;
+            """,
+        ]
+
+    statements.append(
+        """
+        CREATE TRIGGER main_asset_search_update
+        AFTER UPDATE OF description ON main_asset
+        WHEN old.description <> new.description
+        BEGIN
+            UPDATE main_transactionsearch SET asset = new.description
+            WHERE rowid IN (
+                SELECT id * 2 FROM main_incometransaction
+                WHERE asset_id = new.id
+                UNION ALL
+                SELECT id * 2 + 1 FROM main_expensetransaction
+                WHERE asset_id = new.id
+            );
+        END;
+        """
+    )
+    return statements
+
+
+def reverse_sql():
+    statements = ["DROP TRIGGER IF EXISTS main_asset_search_update;"]
+    for _, table, category_table, *_ in SOURCES:
+        statements += [
+            f"DROP TRIGGER IF EXISTS {table}_search_insert;",
+            f"DROP TRIGGER IF EXISTS {table}_search_update;",
+            f"DROP TRIGGER IF EXISTS {table}_search_delete;",
+            f"DROP TRIGGER IF EXISTS {category_table}_search_update;",
+        ]
+    statements.append("DROP TABLE IF EXISTS main_transactionsearch;")
+    return statements
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0009_dataversion"),
+    ]
+
+    operations = [
+        migrations.RunSQL(forward_sql(), reverse_sql()),
+    ]
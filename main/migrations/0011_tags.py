@@ -0,0 +1,75 @@
+# Generated by Django 3.0.4 on 2026-10-18 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_tags(apps, schema_editor):
+    Tag = apps.get_model("main", "Tag")
+    ExpenseTransaction = apps.get_model("main", "ExpenseTransaction")
+    ExpenseTransactionTag = apps.get_model("main", "ExpenseTransactionTag")
+
+    rows = (
+        ExpenseTransaction.objects.exclude(tags__isnull=True)
+        .exclude(tags="")
+        .values_list("pk", "expense__user", "tags")
+    )
+    links = []
+    for pk, user_id, tags in rows.iterator():
+        names = {name.strip().lower()[:256] for name in tags.split(",")}
+        links += [(pk, user_id, name) for name in names if name]
+
+    keys = {(user_id, name) for _, user_id, name in links}
+    Tag.objects.bulk_create(
+        (Tag(user_id=user_id, name=name) for user_id, name in keys),
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+    tags = {
+        (user_id, name): pk
+        for pk, user_id, name in Tag.objects.values_list("pk", "user", "name")
+    }
+    ExpenseTransactionTag.objects.bulk_create(
+        (
+            ExpenseTransactionTag(
+                transaction_id=pk, tag_id=tags[user_id, name]
+            )
+            for pk, user_id, name in links
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0010_transaction_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=256, verbose_name='Tag name')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ExpenseTransactionTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_links', to='main.Tag')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='main.ExpenseTransaction')),
+            ],
+            options={
+                'unique_together': {('tag', 'transaction')},
+            },
+        ),
+        migrations.RunPython(fill_tags, migrations.RunPython.noop),
+    ]
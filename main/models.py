@@ -1,9 +1,57 @@
+from collections import defaultdict
 from decimal import Decimal
 
 from django.conf import settings
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
+from main.cache import invalidate_dashboard
+from main.push import publish_balances
+
+
+class DataVersion(models.Model):
+    """
+    Per user monotonically increasing version of finance data,
+      it's bumped on every write of user's objects
+      and used as ETag source by API read endpoints.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True
+    )
+    version = models.BigIntegerField(
+        verbose_name="User data version", default=0
+    )
+
+    @classmethod
+    def current(cls, user_id):
+        version = (
+            cls.objects.filter(user_id=user_id)
+            .values_list("version", flat=True)
+            .first()
+        )
+        return version or 0
+
+    @classmethod
+    def touch(cls, user_id):
+        """
+        Mark user data as changed: bump version
+            and invalidate cached summary information.
+        """
+
+        if not cls.objects.filter(user_id=user_id).update(
+            version=models.F("version") + 1
+        ):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, version=1)
+            except IntegrityError:
+                cls.objects.filter(user_id=user_id).update(
+                    version=models.F("version") + 1
+                )
+
+        invalidate_dashboard(user_id)
+
 
 class IncomeSource(models.Model):
     user = models.ForeignKey(
@@ -60,6 +108,17 @@ class Asset(models.Model):
         blank=True,
     )
 
+    @classmethod
+    def change_balance(cls, pk, value):
+        """
+        Add value to asset balance with single SQL statement
+            "UPDATE ... SET balance = balance + value",
+            there is no read-modify-write and only balance column changes.
+        """
+        return cls.objects.filter(pk=pk).update(
+            balance=models.F("balance") + Decimal(value)
+        )
+
     def __str__(self):
         return f"{self.description} (balance: {self.balance}, type: {self.get_type_display()})"
 
@@ -84,21 +143,124 @@ class ExpenseCategory(models.Model):
 
     @property
     def monthly_expenses(self):
-        expenses = ExpenseTransaction.objects.filter(
-            expense=self,
-            created_at__year=timezone.now().year,
-            created_at__month=timezone.now().month,
-        ).aggregate(balance=models.Sum("amount"))
-
-        return (
-            0 if expenses.get("balance", None) is None else expenses["balance"]
+        now = timezone.localtime()
+        expenses = (
+            ExpenseMonthlyTotal.objects.filter(
+                expense=self, year=now.year, month=now.month
+            )
+            .values_list("amount", flat=True)
+            .first()
         )
 
+        return 0 if expenses is None else expenses
+
     def __str__(self):
         return f"{self.description} (monthly limit: {self.monthly_expenses:.2f}/{self.monthly_limit:.2f})"
 
 
+class AbstractMonthlyTotal(models.Model):
+    """
+    Incrementally maintained rollup of transaction amounts:
+      one row per (user, category, year, month).
+
+    Rows are changed in the same atomic block as transactions,
+      full rebuild is available with "rebuild_monthly_totals" command.
+    """
+
+    CATEGORY_FIELD = None
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
+    )
+    year = models.PositiveSmallIntegerField(verbose_name="Calendar year")
+    month = models.PositiveSmallIntegerField(verbose_name="Calendar month")
+    amount = models.DecimalField(
+        verbose_name="Monthly transactions amount",
+        blank=False,
+        default=0,
+        max_digits=19,
+        decimal_places=4,
+    )
+
+    @classmethod
+    def apply(cls, user_id, category_id, created_at, value):
+        """
+        Add value to category total for a month of created_at,
+          row is created at first transaction in a month.
+        """
+
+        moment = timezone.localtime(created_at)
+        lookup = {
+            "user_id": user_id,
+            f"{cls.CATEGORY_FIELD}_id": category_id,
+            "year": moment.year,
+            "month": moment.month,
+        }
+
+        if cls.objects.filter(**lookup).update(
+            amount=models.F("amount") + Decimal(value)
+        ):
+            return
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(amount=Decimal(value), **lookup)
+        except IntegrityError:
+            # concurrent writer has created row before us
+            cls.objects.filter(**lookup).update(
+                amount=models.F("amount") + Decimal(value)
+            )
+
+    @classmethod
+    def subtract(cls, category_id, created_at, value):
+        """
+        Remove value of deleted transaction from category total,
+          row is never created here: it might be removed already
+          by cascade delete of category.
+        """
+
+        moment = timezone.localtime(created_at)
+        cls.objects.filter(
+            **{f"{cls.CATEGORY_FIELD}_id": category_id},
+            year=moment.year,
+            month=moment.month,
+        ).update(amount=models.F("amount") - Decimal(value))
+
+    class Meta:
+        abstract = True
+
+
+class IncomeMonthlyTotal(AbstractMonthlyTotal):
+    CATEGORY_FIELD = "income"
+
+    income = models.ForeignKey(IncomeSource, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("income", "year", "month")
+        indexes = [models.Index(fields=["user", "year", "month"])]
+
+
+class ExpenseMonthlyTotal(AbstractMonthlyTotal):
+    CATEGORY_FIELD = "expense"
+
+    expense = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("expense", "year", "month")
+        indexes = [models.Index(fields=["user", "year", "month"])]
+
+
 class AbstractTransaction(models.Model):
+    """
+    Base transaction between asset and category,
+      child classes define category field name
+      and rollup model for monthly totals.
+    """
+
+    CATEGORY_FIELD = None
+    MONTHLY_TOTAL = None
+    BALANCE_SIGN = 1
+
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     amount = models.DecimalField(
@@ -109,19 +271,109 @@ class AbstractTransaction(models.Model):
         decimal_places=4,
     )
 
+    def _change_asset(self, value):
+        """
+        Apply balance delta on database side,
+            loaded asset instance gets the same delta in memory.
+        """
+        Asset.change_balance(self.asset_id, value)
+        if type(self).asset.is_cached(self):
+            self.asset.balance += Decimal(value)
+
     def inc_asset(self, value):
         """
         Increment asset balance on input value.
         """
-        self.asset.balance += Decimal(value)
-        self.asset.save()
+        self._change_asset(Decimal(value))
 
     def dec_asset(self, value):
         """
         Decrement asset balance on input value.
         """
-        self.asset.balance -= Decimal(value)
-        self.asset.save()
+        self._change_asset(-Decimal(value))
+
+    @property
+    def owner_id(self):
+        """
+        User ID of transaction category.
+        """
+        return getattr(self, self.CATEGORY_FIELD).user_id
+
+    def update_monthly_total(self, value):
+        """
+        Change category monthly total on input value.
+        """
+        self.MONTHLY_TOTAL.apply(
+            self.owner_id,
+            getattr(self, f"{self.CATEGORY_FIELD}_id"),
+            self.created_at,
+            value,
+        )
+
+    @classmethod
+    def bulk_save(cls, transactions):
+        """
+        Insert transactions with single bulk_create
+            and apply only one aggregated delta per asset
+            and per category monthly total.
+        Category objects must be set (not only their IDs).
+        """
+
+        asset_deltas = defaultdict(Decimal)
+        total_deltas = {}
+        user_assets = defaultdict(set)
+
+        with transaction.atomic():
+            transactions = cls.objects.bulk_create(transactions)
+            if transactions and transactions[0].pk is None:
+                # SQLite backend doesn't return primary keys,
+                # but it holds write lock till commit,
+                # so the latest ids belong to inserted rows in order
+                ids = list(
+                    cls.objects.order_by("-pk").values_list("pk", flat=True)[
+                        : len(transactions)
+                    ]
+                )
+                for item, pk in zip(transactions, reversed(ids)):
+                    item.pk = pk
+
+            for item in transactions:
+                amount = Decimal(item.amount)
+                asset_deltas[item.asset_id] += cls.BALANCE_SIGN * amount
+
+                category = getattr(item, cls.CATEGORY_FIELD)
+                user_assets[category.user_id].add(item.asset_id)
+                moment = timezone.localtime(item.created_at)
+                key = (
+                    category.user_id,
+                    category.pk,
+                    moment.year,
+                    moment.month,
+                )
+                total_deltas.setdefault(key, [moment, Decimal(0)])[1] += amount
+
+            for asset_id, delta in asset_deltas.items():
+                Asset.change_balance(asset_id, delta)
+            for key, (moment, delta) in total_deltas.items():
+                user_id, category_id, *_ = key
+                cls.MONTHLY_TOTAL.apply(user_id, category_id, moment, delta)
+
+            # bulk_create doesn't send post_save signals
+            for user_id, asset_ids in user_assets.items():
+                DataVersion.touch(user_id)
+                publish_balances(
+                    user_id,
+                    asset_ids=asset_ids,
+                    **{
+                        f"{cls.CATEGORY_FIELD}_ids": {
+                            category_id
+                            for owner_id, category_id, *_ in total_deltas
+                            if owner_id == user_id
+                        }
+                    },
+                )
+
+        return transactions
 
     class Meta:
         abstract = True
@@ -129,8 +381,17 @@ class AbstractTransaction(models.Model):
 
 
 class IncomeTransaction(AbstractTransaction):
+    CATEGORY_FIELD = "income"
+    MONTHLY_TOTAL = IncomeMonthlyTotal
+
     income = models.ForeignKey(IncomeSource, on_delete=models.CASCADE)
 
+    class Meta(AbstractTransaction.Meta):
+        indexes = [
+            models.Index(fields=["asset", "created_at"]),
+            models.Index(fields=["income", "created_at"]),
+        ]
+
     def save(self, *args, **kwargs):
         """
         Redefine standart save method,
@@ -140,12 +401,14 @@ class IncomeTransaction(AbstractTransaction):
         with transaction.atomic():
             self.inc_asset(self.amount)
             super().save(*args, **kwargs)
+            self.update_monthly_total(self.amount)
         return True
 
     def delete(self):
         """
         Redefine standart delete method,
         because need to change asset balance at first.
+        Monthly total is changed by post_delete receiver (main.signals).
         """
 
         with transaction.atomic():
@@ -162,6 +425,10 @@ class IncomeTransaction(AbstractTransaction):
 
 
 class ExpenseTransaction(AbstractTransaction):
+    CATEGORY_FIELD = "expense"
+    MONTHLY_TOTAL = ExpenseMonthlyTotal
+    BALANCE_SIGN = -1
+
     expense = models.ForeignKey(ExpenseCategory, on_delete=models.CASCADE)
     tags = models.CharField(
         verbose_name="Comma separated transaction tags",
@@ -171,12 +438,27 @@ class ExpenseTransaction(AbstractTransaction):
         default="",
     )
 
+    class Meta(AbstractTransaction.Meta):
+        indexes = [
+            models.Index(fields=["asset", "created_at"]),
+            models.Index(fields=["expense", "created_at"]),
+        ]
+
     def save(self, *args, **kwargs):
         with transaction.atomic():
             self.dec_asset(self.amount)
             super().save(*args, **kwargs)
+            self.update_monthly_total(self.amount)
+            Tag.assign([self])
         return True
 
+    @classmethod
+    def bulk_save(cls, transactions):
+        with transaction.atomic():
+            transactions = super().bulk_save(transactions)
+            Tag.assign(transactions, created=True)
+        return transactions
+
     def delete(self):
         with transaction.atomic():
             self.inc_asset(self.amount)
@@ -191,6 +473,87 @@ class ExpenseTransaction(AbstractTransaction):
         )
 
 
+def split_tags(value):
+    """
+    Normalized unique tag names of comma separated string.
+    """
+
+    names = (name.strip().lower() for name in (value or "").split(","))
+    return sorted({name for name in names if name})
+
+
+class Tag(models.Model):
+    """
+    Normalized ExpenseTransaction.tags, every name of comma
+        separated string is linked by ExpenseTransactionTag,
+        so tag filters and totals use index instead of LIKE scan.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
+    )
+    name = models.CharField(verbose_name="Tag name", max_length=256)
+
+    class Meta:
+        unique_together = ("user", "name")
+
+    @classmethod
+    def assign(cls, transactions, created=False):
+        """
+        Replace tag links of saved expense transactions
+            by their tags strings with constant number of queries,
+            "created" skips removal of links for new transactions.
+        """
+
+        if not created:
+            ExpenseTransactionTag.objects.filter(
+                transaction__in=[item.pk for item in transactions]
+            ).delete()
+
+        names = {
+            item.pk: [
+                (item.owner_id, name[: cls._meta.get_field("name").max_length])
+                for name in split_tags(item.tags)
+            ]
+            for item in transactions
+        }
+        keys = {key for item_keys in names.values() for key in item_keys}
+        if not keys:
+            return
+
+        cls.objects.bulk_create(
+            (cls(user_id=user_id, name=name) for user_id, name in keys),
+            ignore_conflicts=True,
+        )
+        tags = {
+            (user_id, name): pk
+            for pk, user_id, name in cls.objects.filter(
+                user__in={user_id for user_id, _ in keys},
+                name__in={name for _, name in keys},
+            ).values_list("pk", "user", "name")
+        }
+        ExpenseTransactionTag.objects.bulk_create(
+            ExpenseTransactionTag(transaction_id=pk, tag_id=tags[key])
+            for pk, item_keys in names.items()
+            for key in item_keys
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class ExpenseTransactionTag(models.Model):
+    transaction = models.ForeignKey(
+        ExpenseTransaction, on_delete=models.CASCADE, related_name="tag_links"
+    )
+    tag = models.ForeignKey(
+        Tag, on_delete=models.CASCADE, related_name="transaction_links"
+    )
+
+    class Meta:
+        unique_together = ("tag", "transaction")
+
+
 class FabricTransaction:
     INCOME = "IncomeTransaction"
     EXPENSE = "ExpenseTransaction"
@@ -0,0 +1,63 @@
+import glob
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+
+
+def profile_files():
+    """
+    Captured profiles metadata paths, the oldest first:
+        file names start with capture time in nanoseconds.
+    """
+
+    return sorted(glob.glob(os.path.join(settings.PROFILE_PATH, "*.json")))
+
+
+def save_profile(profiler, metadata):
+    """
+    Store pstats dump with JSON metadata of request
+        and remove the oldest captures over PROFILE_MAX_FILES.
+    """
+
+    os.makedirs(settings.PROFILE_PATH, exist_ok=True)
+    name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    base = os.path.join(settings.PROFILE_PATH, name)
+
+    profiler.dump_stats(base + ".prof")
+    # metadata is written last, so listed profiles are complete
+    with open(base + ".json.tmp", "w") as output:
+        json.dump(dict(metadata, profile=name + ".prof"), output)
+    os.replace(base + ".json.tmp", base + ".json")
+
+    files = profile_files()
+    for path in files[: max(len(files) - settings.PROFILE_MAX_FILES, 0)]:
+        for stale in (path, path[: -len(".json")] + ".prof"):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                # removed by another worker
+                pass
+    return base + ".prof"
+
+
+def load_profiles():
+    """
+    Metadata dicts of captured profiles,
+        "profile" key is absolute path of pstats dump.
+    """
+
+    profiles = []
+    for path in profile_files():
+        try:
+            with open(path) as source:
+                metadata = json.load(source)
+        except (OSError, ValueError):
+            continue
+        metadata["profile"] = os.path.join(
+            settings.PROFILE_PATH, metadata["profile"]
+        )
+        profiles.append(metadata)
+    return profiles
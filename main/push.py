@@ -0,0 +1,114 @@
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def user_group(user_id):
+    return f"balances-{user_id}"
+
+
+def has_receivers(channel_layer, user_id):
+    """
+    In memory layer delivers messages only inside current process,
+        so without local consumers of user (e.g. in bot process)
+        payload is not built and not sent. Members of other layers
+        groups are not known, messages are always sent.
+    """
+
+    if isinstance(channel_layer, InMemoryChannelLayer):
+        return bool(channel_layer.groups.get(user_group(user_id)))
+    return True
+
+
+def publish_balances(user_id, asset_ids=(), income_ids=(), expense_ids=()):
+    """
+    Schedule push of current balances to user's WebSocket group
+        after DB transaction commit.
+
+    Changes are collected per thread and flushed by first
+        on_commit callback, so cascade deletes send one message.
+    """
+
+    if get_channel_layer() is None:
+        return
+
+    changes = getattr(_local, "changes", None)
+    if changes is None:
+        changes = _local.changes = {}
+    user_changes = changes.setdefault(
+        user_id, {"assets": set(), "incomes": set(), "expenses": set()}
+    )
+    user_changes["assets"].update(asset_ids)
+    user_changes["incomes"].update(income_ids)
+    user_changes["expenses"].update(expense_ids)
+
+    transaction.on_commit(_flush)
+
+
+def balances_payload(user_id, changes):
+    """
+    Read committed balances in /api/common-info/ format:
+        assets balance and current month total of categories.
+
+    Only existing user's rows are returned: changes of rolled back
+        transactions stay pending and are flushed with next commit.
+    """
+
+    from main.models import Asset, IncomeMonthlyTotal, ExpenseMonthlyTotal
+
+    now = timezone.localtime()
+    payload = {
+        "assets": [
+            {"pk": pk, "balance": str(balance)}
+            for pk, balance in Asset.objects.filter(
+                user=user_id, pk__in=changes["assets"]
+            ).values_list("pk", "balance")
+        ]
+    }
+    for key, model in (
+        ("incomes", IncomeMonthlyTotal),
+        ("expenses", ExpenseMonthlyTotal),
+    ):
+        payload[key] = [
+            {"pk": pk, "balance": float(amount)}
+            for pk, amount in model.objects.filter(
+                **{f"{model.CATEGORY_FIELD}__in": changes[key]},
+                user=user_id,
+                year=now.year,
+                month=now.month,
+            )
+            .order_by(model.CATEGORY_FIELD)
+            .values_list(model.CATEGORY_FIELD, "amount")
+        ]
+    return payload
+
+
+def _flush():
+    changes, _local.changes = getattr(_local, "changes", None), None
+    if not changes:
+        return
+
+    channel_layer = get_channel_layer()
+    for user_id, user_changes in changes.items():
+        if not has_receivers(channel_layer, user_id):
+            continue
+        try:
+            async_to_sync(channel_layer.group_send)(
+                user_group(user_id),
+                {
+                    "type": "balances.changed",
+                    "payload": balances_payload(user_id, user_changes),
+                },
+            )
+        except Exception:
+            # push is optional, write has been committed already
+            logger.exception("Balances push failed for user %s", user_id)
@@ -0,0 +1,149 @@
+import atexit
+import glob
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_started = None
+_lock = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """
+    Daemon thread, which takes stacks of all other threads
+        every interval seconds with sys._current_frames()
+        and writes them as collapsed stacks (flamegraph.pl,
+        speedscope) every flush_interval seconds.
+
+    Sampling runs under GIL, so its own CPU time is measured
+        and logged on every flush as overhead share.
+    """
+
+    def __init__(self, name, path, interval, flush_interval, max_files):
+        super().__init__(name=f"stack-sampler-{name}", daemon=True)
+        self.label = name
+        self.path = path
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.max_files = max_files
+        self.stacks = Counter()
+        self.samples = 0
+        self.cpu_time = 0.0
+        self._labels = {}
+        self._finished = threading.Event()
+
+    def _frame_label(self, code, frame):
+        label = self._labels.get(code)
+        if label is None:
+            module = frame.f_globals.get("__name__", "?")
+            label = self._labels[code] = f"{module}:{code.co_name}"
+        return label
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame.f_code, frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def flush(self, elapsed):
+        stacks, self.stacks = self.stacks, Counter()
+        samples, self.samples = self.samples, 0
+        cpu_time, self.cpu_time = self.cpu_time, 0.0
+        if not stacks:
+            return None
+
+        os.makedirs(self.path, exist_ok=True)
+        name = os.path.join(
+            self.path,
+            f"{self.label}-{os.getpid()}-"
+            + f"{time.strftime('%Y%m%d%H%M%S')}.collapsed",
+        )
+        with open(name + ".tmp", "w") as output:
+            for stack, count in stacks.most_common():
+                output.write(f"{stack} {count}\n")
+        os.replace(name + ".tmp", name)
+
+        files = sorted(
+            glob.glob(os.path.join(self.path, "*.collapsed")),
+            key=os.path.getmtime,
+        )
+        for stale in files[: max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+        logger.info(
+            "%s samples written to %s, sampler overhead %.3f%% of one CPU",
+            samples,
+            name,
+            cpu_time / elapsed * 100,
+        )
+        return name
+
+    def run(self):
+        flushed = time.monotonic()
+        while not self._finished.wait(self.interval):
+            started = time.thread_time()
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("Stack sampling failed")
+            self.cpu_time += time.thread_time() - started
+
+            now = time.monotonic()
+            if now - flushed >= self.flush_interval:
+                self._flush_safe(now - flushed)
+                flushed = now
+        self._flush_safe(time.monotonic() - flushed)
+
+    def _flush_safe(self, elapsed):
+        try:
+            self.flush(elapsed)
+        except Exception:
+            # profiling must not break the process
+            logger.exception("Stack samples flush failed")
+
+    def stop(self):
+        self._finished.set()
+        self.join()
+
+
+def start_sampler(name):
+    """
+    Start process-wide sampler if SAMPLER_INTERVAL is set,
+        return running sampler or None.
+    """
+
+    global _started
+    if settings.SAMPLER_INTERVAL <= 0:
+        return None
+
+    with _lock:
+        if _started is None:
+            _started = StackSampler(
+                name,
+                settings.SAMPLER_PATH,
+                settings.SAMPLER_INTERVAL,
+                settings.SAMPLER_FLUSH_INTERVAL,
+                settings.SAMPLER_MAX_FILES,
+            )
+            _started.start()
+            # the latest samples are written on normal exit
+            atexit.register(_started.stop)
+    return _started
@@ -0,0 +1,101 @@
+import re
+
+from django.db import connection
+
+from main.models import IncomeTransaction, ExpenseTransaction
+
+
+SEARCH_TABLE = "main_transactionsearch"
+
+# bm25 weights of tags, category, asset and owner columns
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 0.0)
+
+SEARCH_SOURCES = {
+    "income": IncomeTransaction,
+    "expense": ExpenseTransaction,
+}
+
+
+def match_expression(user_id, query):
+    """
+    Convert user input into FTS5 query, where every word
+        is prefix term, all of them must be found in tags,
+        category or asset descriptions of user's transactions.
+    Return None if there are no words.
+
+    FTS5 syntax characters are dropped, so input can't break query.
+    """
+
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return None
+    return (
+        f"owner:user{user_id} AND "
+        + "{tags category asset} : ("
+        + " ".join(f'"{term}"*' for term in terms)
+        + ")"
+    )
+
+
+def search_hits(user_id, query, limit, offset=0):
+    """
+    Return ranked list of (kind, transaction id) pairs.
+    """
+
+    expression = match_expression(user_id, query)
+    if expression is None:
+        return []
+
+    weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT kind, transaction_id FROM {SEARCH_TABLE} "
+            + f"WHERE {SEARCH_TABLE} MATCH %s "
+            + f"ORDER BY bm25({SEARCH_TABLE}, {weights}) "
+            + "LIMIT %s OFFSET %s",
+            [expression, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def search_transactions(user_id, query, limit, offset=0):
+    """
+    Ranked transactions of user, which match query,
+        as flat dicts of export format (api.exports).
+    """
+
+    hits = search_hits(user_id, query, limit, offset)
+
+    rows = {}
+    for kind, model in SEARCH_SOURCES.items():
+        ids = [pk for hit_kind, pk in hits if hit_kind == kind]
+        if not ids:
+            continue
+
+        category = model.CATEGORY_FIELD
+        fields = [
+            "id",
+            "created_at",
+            "amount",
+            "asset_id",
+            "asset__description",
+            f"{category}_id",
+            f"{category}__description",
+        ]
+        if kind == "expense":
+            fields.append("tags")
+
+        for row in model.objects.filter(pk__in=ids).values(*fields):
+            rows[kind, row["id"]] = {
+                "type": kind,
+                "id": row["id"],
+                "created_at": row["created_at"],
+                "amount": row["amount"],
+                "asset_id": row["asset_id"],
+                "asset": row["asset__description"],
+                "category_id": row[f"{category}_id"],
+                "category": row[f"{category}__description"],
+                "tags": row.get("tags") or "",
+            }
+
+    return [rows[hit] for hit in hits if hit in rows]
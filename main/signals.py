@@ -0,0 +1,143 @@
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from main.models import (
+    DataVersion,
+    Asset,
+    IncomeSource,
+    ExpenseCategory,
+    IncomeTransaction,
+    ExpenseTransaction,
+)
+from main.push import publish_balances
+
+
+_local = threading.local()
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_save, sender=IncomeSource)
+@receiver(post_save, sender=ExpenseCategory)
+@receiver(post_delete, sender=Asset)
+@receiver(post_delete, sender=IncomeSource)
+@receiver(post_delete, sender=ExpenseCategory)
+def category_changed(sender, instance, **kwargs):
+    DataVersion.touch(instance.user_id)
+
+
+@receiver(post_save, sender=IncomeTransaction)
+@receiver(post_save, sender=ExpenseTransaction)
+@receiver(post_delete, sender=IncomeTransaction)
+@receiver(post_delete, sender=ExpenseTransaction)
+def transaction_changed(sender, instance, **kwargs):
+    """
+    Signals are sent for save() and delete() calls
+        and also for queryset and cascade deletes,
+        which don't call overridden model methods.
+
+    Changes are collected per thread and flushed by first
+        on_commit callback: data version is bumped and balances
+        are pushed once per user, so asset delete with many
+        transactions doesn't write per row.
+    """
+
+    changes = getattr(_local, "changes", None)
+    if changes is None:
+        changes = _local.changes = []
+    changes.append(
+        (
+            sender,
+            _loaded_owner_id(sender, instance),
+            instance.asset_id,
+            getattr(instance, f"{sender.CATEGORY_FIELD}_id"),
+        )
+    )
+    transaction.on_commit(_flush)
+
+
+def _loaded_owner_id(sender, instance):
+    """
+    User ID of transaction from already fetched asset or category,
+        None for instances of cascade deletes without them.
+    """
+
+    for field in ("asset", sender.CATEGORY_FIELD):
+        if getattr(sender, field).is_cached(instance):
+            return getattr(instance, field).user_id
+    return None
+
+
+def _resolve_owners(changes):
+    """
+    Owners of changes without fetched relations, one query per model.
+        Asset is looked up first, category is used if asset
+        has been deleted with its transactions.
+    """
+
+    unknown = [change for change in changes if change[1] is None]
+    if not unknown:
+        return {}, {}
+
+    assets = dict(
+        Asset.objects.filter(
+            pk__in={asset_id for _, _, asset_id, _ in unknown}
+        ).values_list("pk", "user")
+    )
+    categories = {}
+    for sender in {change[0] for change in unknown}:
+        model = getattr(sender, sender.CATEGORY_FIELD).field.related_model
+        category_ids = {
+            category_id
+            for change_sender, _, asset_id, category_id in unknown
+            if change_sender is sender and asset_id not in assets
+        }
+        if category_ids:
+            categories[sender] = dict(
+                model.objects.filter(pk__in=category_ids).values_list(
+                    "pk", "user"
+                )
+            )
+    return assets, categories
+
+
+def _flush():
+    changes, _local.changes = getattr(_local, "changes", None), None
+    if not changes:
+        return
+
+    assets, categories = _resolve_owners(changes)
+    users = defaultdict(lambda: defaultdict(set))
+    for sender, owner_id, asset_id, category_id in changes:
+        if owner_id is None:
+            owner_id = assets.get(asset_id) or categories.get(
+                sender, {}
+            ).get(category_id)
+        if owner_id is None:
+            # whole user's data has been deleted
+            continue
+        users[owner_id]["asset_ids"].add(asset_id)
+        users[owner_id][f"{sender.CATEGORY_FIELD}_ids"].add(category_id)
+
+    for user_id, ids in users.items():
+        DataVersion.touch(user_id)
+        publish_balances(user_id, **ids)
+
+
+@receiver(post_delete, sender=IncomeTransaction)
+@receiver(post_delete, sender=ExpenseTransaction)
+def transaction_deleted(sender, instance, **kwargs):
+    """
+    Monthly total is decremented here and not in delete(),
+        because queryset deletes (bot) and cascade deletes
+        of assets and categories don't call it.
+    """
+
+    sender.MONTHLY_TOTAL.subtract(
+        getattr(instance, f"{sender.CATEGORY_FIELD}_id"),
+        instance.created_at,
+        instance.amount,
+    )
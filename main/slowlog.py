@@ -0,0 +1,151 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(settings.BASE_DIR)
+
+# execute wrappers of the project, they are not call sites
+WRAPPER_FILES = {
+    os.path.join(PROJECT_ROOT, "main", "slowlog.py"),
+    os.path.join(PROJECT_ROOT, "main", "metrics.py"),
+}
+
+# installed packages, also a virtualenv inside the checkout
+LIBRARY_DIRS = tuple(
+    os.path.join(path, "")
+    for path in {
+        os.path.realpath(path)
+        for path in (
+            sys.prefix,
+            sys.base_prefix,
+            os.path.join(PROJECT_ROOT, "venv"),
+            os.path.join(PROJECT_ROOT, ".venv"),
+        )
+    }
+    # prefix of checkout itself would hide every project frame
+    if not os.path.join(os.path.realpath(PROJECT_ROOT), "").startswith(
+        os.path.join(path, "")
+    )
+)
+LIBRARY_PARTS = (
+    f"{os.sep}site-packages{os.sep}",
+    f"{os.sep}dist-packages{os.sep}",
+)
+
+_local = threading.local()
+
+
+def is_project_file(filename):
+    if not filename.startswith(PROJECT_ROOT + os.sep):
+        return False
+    if filename in WRAPPER_FILES:
+        return False
+    if any(part in filename for part in LIBRARY_PARTS):
+        return False
+    return not os.path.realpath(filename).startswith(LIBRARY_DIRS)
+
+
+def call_site():
+    """
+    The innermost stack frame of project code (not a library,
+        also installed into venv of checkout, and not execute wrapper)
+        as ("api/views.py:Class.method", line).
+    """
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if is_project_file(filename):
+            code = frame.f_code
+            name = getattr(code, "co_qualname", code.co_name)
+            path = os.path.relpath(filename, PROJECT_ROOT)
+            return f"{path}:{name}", frame.f_lineno
+        frame = frame.f_back
+    return "<unknown>", 0
+
+
+def query_plan(connection, sql, params):
+    """
+    EXPLAIN QUERY PLAN rows of statement, SQLite only.
+        Plan query goes through execute wrappers too,
+        thread-local flag stops recursion.
+    """
+
+    if connection.vendor != "sqlite":
+        return ""
+
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return "\n".join(row[-1] for row in cursor.fetchall())
+    except Exception as err:
+        return f"<plan is not available: {err}>"
+    finally:
+        _local.explaining = False
+
+
+class SlowQueryLog:
+    """
+    connection.execute_wrapper, which logs statements slower
+        than SLOW_QUERY_THRESHOLD seconds with query plan
+        and project call site. Parameters are not logged.
+    """
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "explaining", False):
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= settings.SLOW_QUERY_THRESHOLD:
+                site, line = call_site()
+                plan = (
+                    "<executemany>"
+                    if many
+                    else query_plan(context["connection"], sql, params)
+                )
+                logger.warning(
+                    "Slow query %.1fms at %s (line %s):\n%s\nplan:\n%s",
+                    duration * 1000,
+                    site,
+                    line,
+                    sql,
+                    plan,
+                )
+
+
+def install_wrapper(connection, **kwargs):
+    if not any(
+        isinstance(wrapper, SlowQueryLog)
+        for wrapper in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(SlowQueryLog())
+
+
+def install_slow_query_log():
+    """
+    Log slow queries of every DB connection of process,
+        if SLOW_QUERY_THRESHOLD is set.
+    """
+
+    if settings.SLOW_QUERY_THRESHOLD <= 0:
+        return
+
+    connection_created.connect(install_wrapper, dispatch_uid=__name__)
+    # connections opened before, e.g. by system checks
+    for connection in connections.all():
+        if connection.connection is not None:
+            install_wrapper(connection)
@@ -1,3 +1,267 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from main.models import (
+    DataVersion,
+    Asset,
+    IncomeSource,
+    ExpenseCategory,
+    IncomeMonthlyTotal,
+    ExpenseMonthlyTotal,
+    IncomeTransaction,
+    ExpenseTransaction,
+)
+from main.profiling import load_profiles
+from main.sampler import StackSampler
+from main.slowlog import PROJECT_ROOT, SlowQueryLog, is_project_file
+
+
+class MetricsTest(TestCase):
+    def test_request_metrics_are_exported_for_local_scrape(self):
+        user = get_user_model().objects.create(username="metrics")
+        self.client.force_login(user)
+        self.client.get("/api/search/", {"q": "food"})
+        self.client.logout()
+
+        response = self.client.get("/metrics", REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn(
+            'finance_request_queries_count{view="api:search-list",'
+            + 'method="GET"} ',
+            content,
+        )
+        self.assertIn("# TYPE finance_request_sql_seconds histogram", content)
+
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_token_scrape_through_unix_socket(self):
+        # daphne on unix socket has no client address
+        response = self.client.get("/metrics", REMOTE_ADDR="")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            "/metrics", REMOTE_ADDR="", HTTP_AUTHORIZATION="Bearer wrong"
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            "/metrics",
+            REMOTE_ADDR="",
+            HTTP_AUTHORIZATION="Bearer scrape-token",
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class MonthlyTotalTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="totals")
+        self.cash, self.card = (
+            Asset.objects.create(user=self.user, description=description)
+            for description in ("cash", "card")
+        )
+        self.income = IncomeSource.objects.create(
+            user=self.user, description="salary"
+        )
+        self.expense = ExpenseCategory.objects.create(
+            user=self.user, description="food", monthly_limit=100
+        )
+
+    def _expense(self, asset, amount):
+        item = ExpenseTransaction(
+            asset=asset, expense=self.expense, amount=amount
+        )
+        item.save()
+        return item
+
+    def _totals(self):
+        return [
+            model.objects.filter(user=self.user).aggregate(
+                total=Sum("amount")
+            )["total"]
+            for model in (IncomeMonthlyTotal, ExpenseMonthlyTotal)
+        ]
+
+    def test_totals_follow_every_kind_of_delete(self):
+        IncomeTransaction(
+            asset=self.card, income=self.income, amount=10
+        ).save()
+        self._expense(self.cash, 5)
+        self._expense(self.card, 7)
+        self.assertEqual(self._totals(), [10, 12])
+
+        self._expense(self.card, 3).delete()
+        self.assertEqual(self._totals(), [10, 12])
+
+        # bot deletes transactions with queryset
+        ExpenseTransaction.objects.filter(
+            pk=self._expense(self.card, 4).pk
+        ).delete()
+        self.assertEqual(self._totals(), [10, 12])
+
+        # cascade of asset
+        self.cash.delete()
+        self.assertEqual(self._totals(), [10, 7])
+
+        totals = list(
+            ExpenseMonthlyTotal.objects.values_list("expense", "amount")
+        )
+        call_command("rebuild_monthly_totals", stdout=StringIO())
+        self.assertEqual(
+            list(ExpenseMonthlyTotal.objects.values_list("expense", "amount")),
+            totals,
+        )
+
+        # cascade of category removes its totals too
+        self.expense.delete()
+        self.assertEqual(self._totals(), [10, None])
+
+
+class DataVersionTest(TransactionTestCase):
+    """
+    Data version is bumped after commit, so test uses real transactions.
+    """
+
+    def test_cascade_delete_queries_do_not_depend_on_transactions(self):
+        user = get_user_model().objects.create(username="versions")
+        expense = ExpenseCategory.objects.create(
+            user=user, description="food", monthly_limit=100
+        )
+        queries = []
+        for count in (2, 40):
+            asset = Asset.objects.create(user=user, description="card")
+            ExpenseTransaction.bulk_save(
+                [
+                    ExpenseTransaction(asset=asset, expense=expense, amount=1)
+                    for _ in range(count)
+                ]
+            )
+            version = DataVersion.current(user.pk)
+            with CaptureQueriesContext(connection) as context:
+                asset.delete()
+            # monthly totals are decremented inside DB transaction per row
+            queries.append(
+                [
+                    query["sql"]
+                    for query in context.captured_queries
+                    if "monthlytotal" not in query["sql"]
+                ]
+            )
+            self.assertGreater(DataVersion.current(user.pk), version)
+
+        self.assertEqual(len(queries[0]), len(queries[1]))
+        self.assertFalse(ExpenseTransaction.objects.exists())
+
+
+class SeedDataTest(TestCase):
+    def test_seeded_history_matches_balances_and_totals(self):
+        call_command(
+            "seed_data",
+            users=2,
+            years=1,
+            incomes_per_month=1,
+            expenses_per_month=5,
+            stdout=StringIO(),
+        )
+
+        user = get_user_model().objects.get(username="seed-1")
+        expenses = ExpenseTransaction.objects.filter(asset__user=user)
+        self.assertEqual(expenses.count(), 13 * 5)
+        self.assertGreater(
+            expenses.dates("created_at", "month").count(), 1
+        )
+        self.assertEqual(
+            ExpenseMonthlyTotal.objects.filter(user=user).aggregate(
+                total=Sum("amount")
+            )["total"],
+            expenses.aggregate(total=Sum("amount"))["total"],
+        )
+        self.assertTrue(user.telegramuser_set.filter(is_active=True))
+        self.assertTrue(Asset.objects.filter(user=user).exists())
+
+
+class ProfilingTest(TestCase):
+    def test_staff_requests_are_captured_and_rotated(self):
+        with tempfile.TemporaryDirectory() as path, override_settings(
+            PROFILE_PATH=path, PROFILE_STAFF=True, PROFILE_MAX_FILES=2
+        ):
+            user = get_user_model().objects.create(
+                username="profiled", is_staff=True
+            )
+            self.client.force_login(user)
+            for _ in range(3):
+                self.client.get("/api/tags/")
+
+            profiles = load_profiles()
+            self.assertEqual(len(profiles), 2)
+            self.assertEqual(profiles[-1]["view"], "api:tags-list")
+            self.assertEqual(profiles[-1]["reason"], "staff")
+
+            output = StringIO()
+            call_command("profiles", functions=3, stdout=output)
+            self.assertIn("GET /api/tags/", output.getvalue())
+
+
+class StackSamplerTest(TestCase):
+    def test_collapsed_stacks_are_written_on_stop(self):
+        with tempfile.TemporaryDirectory() as path:
+            sampler = StackSampler("test", path, 0.001, 60, 10)
+            sampler.start()
+            deadline = time.monotonic() + 0.2
+            while time.monotonic() < deadline:
+                sum(range(1000))
+            sampler.stop()
+
+            (name,) = os.listdir(path)
+            self.assertTrue(name.startswith(f"test-{os.getpid()}-"))
+            with open(os.path.join(path, name)) as source:
+                lines = source.read().splitlines()
+        self.assertTrue(
+            any(
+                line.startswith("MainThread;")
+                and "main.tests:test_collapsed_stacks" in line
+                for line in lines
+            )
+        )
+        self.assertTrue(
+            all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        )
+
+
+class SlowQueryLogTest(TestCase):
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_slow_query_is_logged_with_plan_and_call_site(self):
+        with self.assertLogs("main.slowlog", "WARNING") as logs:
+            with connection.execute_wrapper(SlowQueryLog()):
+                list(Asset.objects.filter(user=1))
+
+        (message,) = logs.output
+        self.assertIn(
+            "main/tests.py:SlowQueryLogTest.test_slow_query_is_logged", message
+        )
+        self.assertIn('FROM "main_asset"', message)
+        self.assertIn("SEARCH main_asset USING", message)
+
+    def test_venv_inside_checkout_is_not_call_site(self):
+        def in_checkout(path):
+            return os.path.join(PROJECT_ROOT, *path.split("/"))
+
+        self.assertTrue(is_project_file(in_checkout("api/views.py")))
+        for path in (
+            "main/slowlog.py",
+            "venv/lib/python3.8/site-packages/django/db/utils.py",
+            ".venv/lib/python3.8/site-packages/rest_framework/views.py",
+            "env/lib/python3/dist-packages/rest_framework/views.py",
+            "venv/bin/daphne",
+        ):
+            self.assertFalse(is_project_file(in_checkout(path)), path)
+        self.assertFalse(is_project_file("/usr/lib/python3/json/decoder.py"))
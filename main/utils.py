@@ -0,0 +1,68 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def month_bounds(moment=None):
+    """
+    Return half-open bounds [start, end) of calendar month
+        in current timezone, by default for current month.
+
+    Filter with bounds looks like
+        created_at >= start AND created_at < end
+        and, unlike __year/__month lookups, uses created_at indexes.
+    """
+
+    moment = timezone.localtime(moment)
+    start = datetime(moment.year, moment.month, 1)
+    end = (
+        datetime(moment.year + 1, 1, 1)
+        if moment.month == 12
+        else datetime(moment.year, moment.month + 1, 1)
+    )
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def parse_moment(value):
+    """
+    Convert ISO date ("2020-03-01") or datetime string
+        into aware datetime, date means midnight in current timezone.
+    Raise ValueError on wrong format.
+    """
+
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"wrong date format: {value}")
+        moment = datetime.combine(date, time.min)
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def period_bounds(start=None, end=None):
+    """
+    Return half-open bounds for "from" and "to" string values,
+        any of them might be omitted and stays None (open range).
+    """
+
+    return (
+        parse_moment(start) if start else None,
+        parse_moment(end) if end else None,
+    )
+
+
+def period_filter(start=None, end=None, field="created_at"):
+    """
+    Build queryset filter arguments for bounds [start, end).
+    """
+
+    lookups = {}
+    if start is not None:
+        lookups[f"{field}__gte"] = start
+    if end is not None:
+        lookups[f"{field}__lt"] = end
+    return lookups
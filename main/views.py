@@ -1,3 +1,17 @@
-from django.shortcuts import render
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 
-# Create your views here.
+from main.metrics import render_metrics
+from main.middleware import is_metrics_scrape
+
+
+def metrics(request):
+    """
+    Request metrics in Prometheus text format, local scrapes only.
+    """
+
+    if not is_metrics_scrape(request):
+        raise PermissionDenied()
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4"
+    )